@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local folder setup helpers.
+
+Creates the videos/ folder tree either from the fixed list of course folders
+or from the folder entries in tree.md.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Course folders created by the fixed-list scripts
+FOLDERS = (
+    'Замещающий ребенок',
+    'Курс "Вашу мать: исследование материнского интроекта"',
+    'Отец',
+    'Привязанность',
+    'Секреты',
+    'Сепарационная тревога',
+    'Тень',
+    'Трансгенерационное',
+    'Фин сценарии',
+)
+
+# Filesystem-encoded FOLDERS, computed once at import
+_FOLDERS_RAW = {name: os.fsencode(name) for name in FOLDERS}
+
+
+def parse_tree(tree_file: str) -> list:
+    """
+    Extract folder names from tree.md (lines like "- `Folder/`").
+
+    Args:
+        tree_file: Path to tree.md file
+
+    Returns:
+        List of folder names in file order
+    """
+    folders = []
+    # Scan line by line instead of holding the whole file in memory
+    with open(tree_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            s = line.strip()
+            if s.startswith('- `') and s.endswith('/`') and len(s) > 5:
+                folders.append(s[3:-2])
+    return folders
+
+
+def _mkdir_one(raw_path: bytes) -> None:
+    """Create a single folder, tolerating existing folders and missing parents."""
+    # root already exists, so a single mkdir is enough for flat names
+    try:
+        os.mkdir(raw_path)
+    except FileExistsError:
+        pass
+    except FileNotFoundError:
+        # Nested name whose parent is missing (or not created yet by another worker)
+        os.makedirs(raw_path, exist_ok=True)
+
+
+def make_folders(names, root: str, result_path: str = None,
+                 header: str = 'Created {count} folders:\n',
+                 line: str = '{path}\n', footer: str = '') -> list:
+    """
+    Create one folder per name inside root.
+
+    Args:
+        names: Sequence of folder names to create
+        root: Parent directory (created if missing)
+        result_path: Optional file to write the list of created folders to
+        header: Result file header; {count} and {root} are filled in
+        line: Result file line per folder; {path} and {name} are filled in
+        footer: Result file footer; {count} and {root} are filled in
+
+    Returns:
+        List of created folder paths
+    """
+    os.makedirs(root, exist_ok=True)
+
+    # One readdir tells us which folders exist already, so re-runs skip
+    # the mkdir round-trip that would just return EEXIST
+    with os.scandir(root) as entries:
+        existing = {entry.name for entry in entries if entry.is_dir()}
+
+    # Keep plain `root + os.sep + name` concatenation here: pathlib.Path and
+    # os.path.join are measurably slower for these internal, controlled paths
+    prefix = root + os.sep
+    created = [prefix + folder for folder in names]
+
+    # Encode once up front so mkdir gets bytes and skips the per-call
+    # str -> filesystem encoding conversion; the shared prefix is encoded once
+    raw_prefix = os.fsencode(prefix)
+    raw_paths = [raw_prefix + (_FOLDERS_RAW.get(folder) or os.fsencode(folder))
+                 for folder in names if folder not in existing]
+
+    # mkdir releases the GIL, so independent folders are created concurrently
+    if raw_paths:
+        with ThreadPoolExecutor(max_workers=min(8, len(raw_paths))) as executor:
+            list(executor.map(_mkdir_one, raw_paths))
+
+    if result_path:
+        # Each script keeps its own result file layout via header/line/footer
+        count = len(created)
+        body = (header.format(count=count, root=root)
+                + ''.join(line.format(path=path, name=name)
+                          for path, name in zip(created, names))
+                + footer.format(count=count, root=root))
+        fd = os.open(result_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, body.encode('utf-8'))
+        finally:
+            os.close(fd)
+
+    return created
@@ -10,11 +10,24 @@ import os
 import sys
 import re
 import argparse
+import atexit
+import functools
+import hashlib
+import json
+import time
+import threading
+import unicodedata
+import weakref
 import requests
+from collections import deque
+from contextlib import ExitStack, suppress
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Tuple, Optional, Any
-from urllib.parse import quote
+from urllib.parse import quote, urlsplit, urlunsplit, parse_qsl, urlencode
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 import yt_dlp
 
 # Exit codes
@@ -23,7 +36,272 @@ EXIT_INVALID_ARGS = 1
 EXIT_ERROR = 2
 
 # Video file extensions
-VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mkv', '.mov', '.webm', '.flv', '.wmv', '.m4v', '.3gp', '.ogv']
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.webm', '.flv', '.wmv', '.m4v', '.3gp', '.ogv')
+
+# URLs downloaded directly (with requests) rather than through yt-dlp
+_DIRECT_DOWNLOAD_EXTENSIONS = VIDEO_EXTENSIONS + ('.m3u8', '.mpd')
+
+# Last path segments treated as a file name, not a folder, in destination paths
+_FILE_LIKE_EXTENSIONS = VIDEO_EXTENSIONS + ('.txt', '.zip', '.rar')
+
+# Non-video file extensions (used to tell files from folders in listings)
+_OTHER_FILE_EXTENSIONS = ('.txt', '.pdf', '.doc', '.zip', '.rar', '.jpg', '.png', '.gif', '.json', '.xml', '.mp3', '.wav', '.ogg')
+
+# Folders that are never crawled
+_IGNORED_FOLDERS = ('Аудио', 'Доки')
+
+# Reads display name and link candidates of listing elements in one page round-trip
+# (used with page.eval_on_selector_all instead of per-element get_attribute calls).
+# matched_href (a link whose text equals the name) is only searched for elements
+# with no other link candidate.
+# With opts.kind set to 'folders' or 'videos', elements of the other kind are
+# returned as null so they never cross to Python; positions stay aligned with
+# query_selector_all handles for the same selector.
+_SCRAPE_ELEMENTS_JS = """
+(elements, opts) => {
+    let linkTexts = null;
+    return elements.map(el => {
+        const name = el.getAttribute('data-file-name') || el.getAttribute('data-resource-name') ||
+                     el.getAttribute('data-name') || el.getAttribute('title') ||
+                     el.getAttribute('aria-label') || el.innerText || el.textContent;
+        if (opts.kind) {
+            const n = (name || '').replace(/[\\n\\r]/g, '').trim().toLowerCase();
+            const isVideo = opts.video_exts.some(ext => n.endsWith(ext));
+            const keep = opts.kind === 'videos'
+                ? isVideo
+                : !isVideo && !opts.other_exts.some(ext => n.endsWith(ext)) &&
+                  !opts.ignored.includes((name || '').trim());
+            if (!keep) {
+                return null;
+            }
+        }
+        const child = el.querySelector('a[href]');
+        const closest = el.closest('a[href]');
+        const record = {
+            name: name,
+            href: el.getAttribute('href'),
+            child_href: child ? child.getAttribute('href') : null,
+            closest_href: closest ? closest.getAttribute('href') : null,
+            data_href: el.getAttribute('data-href') || el.getAttribute('data-url') ||
+                       el.getAttribute('data-link'),
+            matched_href: null,
+        };
+        if (!record.href && !record.child_href && !record.closest_href && !record.data_href) {
+            if (linkTexts === null) {
+                linkTexts = Array.from(document.querySelectorAll('a[href]'), a => [
+                    (a.innerText || a.textContent || a.getAttribute('title') ||
+                     a.getAttribute('aria-label') || '').trim(),
+                    a.getAttribute('href'),
+                ]);
+            }
+            const match = linkTexts.find(([text]) => text && text === name);
+            record.matched_href = match ? match[1] : null;
+        }
+        return record;
+    });
+}
+"""
+
+# Single-element version of the name lookup above, one round-trip
+# (instead of a get_attribute call per attribute)
+_ELEMENT_NAME_JS = """
+el => el.getAttribute('data-file-name') || el.getAttribute('data-resource-name') ||
+      el.getAttribute('data-name') || el.getAttribute('title') ||
+      el.getAttribute('aria-label') || el.innerText || el.textContent
+"""
+
+# Listing elements whose name equals the (lowercased) target, with their links,
+# in one round-trip; index points back into the selector's matches for clicking
+_FIND_FILE_JS = """
+(elements, target) => {
+    const matches = [];
+    elements.forEach((el, index) => {
+        const name = (el.getAttribute('data-file-name') || el.getAttribute('data-resource-name') ||
+                      el.getAttribute('data-name') || el.getAttribute('title') ||
+                      el.getAttribute('aria-label') || el.innerText || el.textContent || '').trim();
+        if (!name || name.toLowerCase() !== target) {
+            return;
+        }
+        const child = el.querySelector('a[href]');
+        matches.push({
+            index: index,
+            name: name,
+            href: el.getAttribute('href') || (child ? child.getAttribute('href') : null),
+        });
+    });
+    return matches;
+}
+"""
+
+# src of <video>/<source> elements, then of iframes, in one round-trip
+_MEDIA_SOURCES_JS = """
+() => [
+    ...document.querySelectorAll('video[src], video source[src]'),
+    ...document.querySelectorAll('iframe[src]'),
+].map(el => ({tag: el.tagName, src: el.getAttribute('src')}))
+"""
+
+# Filter arguments for _SCRAPE_ELEMENTS_JS
+_SCRAPE_FILTER = {
+    'video_exts': list(VIDEO_EXTENSIONS),
+    'other_exts': list(_OTHER_FILE_EXTENSIONS),
+    'ignored': list(_IGNORED_FOLDERS),
+}
+
+# Any of these means the folder listing has rendered
+_LISTING_READY_SELECTOR = 'a[href*="/d/"], [data-file-name], .listing-item, .resource-item'
+
+# File/folder entries of a listing page, and the catch-all used when none match
+_LISTING_SELECTOR = ', '.join([
+    'a[href*="/d/"]', '.file-item', '[data-file-name]', '.listing-item',
+    '.resource-item', '.listing-item__title', '.listing-item__title-link',
+    '.resource__name', '.resource__title', '.file__name',
+    'a.resource__name-link', 'a[class*="resource"]',
+    'a[class*="file"]', 'a[class*="listing"]',
+])
+_FALLBACK_SELECTOR = 'a[href]'
+
+# Captcha markers, combined so one query checks them all
+_CAPTCHA_SELECTOR = ', '.join([
+    '[class*="captcha"]',
+    '[class*="Captcha"]',
+    '[id*="captcha"]',
+    '[id*="Captcha"]',
+    'iframe[src*="captcha"]',
+    'iframe[src*="smartcaptcha"]',
+])
+
+# Element check plus the "robot / captcha / confirm" page text, in one round-trip
+_CAPTCHA_CHECK_JS = """
+selector => !!document.querySelector(selector) ||
+    /[Рр]обот|[Cc]aptcha|[Пп]одтвердите/.test(document.body ? document.body.innerText : '')
+"""
+
+# Web-font URL patterns (CDP wildcards, query strings included); blocked at the
+# browser so folder pages fetch fewer bytes. Images and stylesheets stay enabled:
+# the captcha must remain solvable by hand and clicks need a laid-out page.
+_BLOCKED_URL_PATTERNS = ['*.woff*', '*.ttf*', '*.otf*', '*.eot*']
+
+# Streaming (HLS/mp4) and direct video download requests; matched browser-side
+# by page.route so unrelated requests never reach Python
+_VIDEO_REQUEST_RE = re.compile(
+    r'streaming\.disk\.yandex\.(?:net|ru)/.*(?:/hls/|\.m3u8|\.mp4)'
+    r'|/d/.*\.(?:mp4|avi|mkv|mov|webm)$'
+)
+
+# Streaming-host requests only; the route pattern for click-to-capture in
+# process_videos_sequentially and find_file_on_page
+_STREAM_REQUEST_RE = re.compile(r'streaming\.disk\.yandex\.(?:net|ru)/.*(?:/hls/|\.m3u8|\.mp4)')
+
+# Streaming video URL = streaming host + HLS/mp4 path; see _is_stream_url()
+_STREAM_HOST_RE = re.compile(r'streaming\.disk\.yandex\.(?:net|ru)')
+_STREAM_PATH_RE = re.compile(r'/hls/|\.m3u8(?:$|\?)|\.mp4(?:$|\?)')
+_CAPTCHA_URL_RE = re.compile(r'captcha', re.IGNORECASE)
+
+# Query params that change between requests for the same video; ignored when
+# deduplicating captured URLs (see _capture_key)
+_VOLATILE_QUERY_PARAMS = frozenset({'ts', 'expires', 'signature-time'})
+
+# Link/src usable as a video download URL: streaming host or public /d/ link
+_VIDEO_LINK_RE = re.compile(r'streaming\.disk\.yandex|/d/')
+
+# Listing names can contain line breaks: dropped for extension checks,
+# turned into spaces for display names and paths
+_NEWLINE_DROP = str.maketrans('', '', '\n\r')
+_NEWLINE_TO_SPACE = str.maketrans('\n\r', '  ')
+
+# tree.md parsing: list entry status, "## Файлы" list, ``` tree block, list entry, tree node
+_STATUS_LINE_RE = re.compile(r'- (?:\[([pPxX ])\]|✓)\s*`([^`]+)`')
+_FILES_SECTION_RE = re.compile(r'## Файлы\s*\n\n(.*?)(?=\n\n|$)', re.DOTALL)
+_FILES_HEADER_RE = re.compile(r'## Файлы\n\n')
+_TREE_BLOCK_RE = re.compile(r'```\s*\n(.*?)\n```', re.DOTALL)
+_FILE_LINE_RE = re.compile(r'- \[[px ]\]\s*`?([^`\n]+)`?')
+_TREE_NODE_RE = re.compile(r'([│ ]*)[├└]── (.+?)(?: (\[[px ]\]|✓))?$')
+
+# Characters not allowed in local file/folder names, mapped to '_'
+_SANITIZE_TABLE = str.maketrans('<>:"|?*\\', '________')
+_UNDERSCORE_RUN_RE = re.compile(r'_+')
+
+# Trailing date/time suffix in folder names (e.g. "Тень 12.03.2023 19:00")
+_DATE_SUFFIX_RE = re.compile(r'\s*\d{1,2}\.\d{1,2}\.\d{2,4}.*$')
+
+# Shared HTTP session: keeps TLS connections to cloud-api.yandex.net and the
+# download hosts alive between files. Only GET/HEAD are retried; PUT uploads
+# stream a file object that cannot be replayed.
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=5, backoff_factor=0.5,
+                      status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=frozenset({'GET', 'HEAD'}),
+                      raise_on_status=False),
+))
+
+# Parallel download+upload jobs in --use-tree mode (network-bound, so more than CPUs)
+_TRANSFER_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# Public folder listings (see list_public_resources): entries per request, and
+# folders of one tree level listed concurrently
+_PUBLIC_RESOURCES_API = 'https://cloud-api.yandex.net/v1/disk/public/resources'
+_PUBLIC_LISTING_LIMIT = 200
+_LISTING_WORKERS = 4
+
+# Serializes tree.md read-modify-write cycles between transfer workers
+_TREE_LOCK = threading.Lock()
+
+# tree.md marks waiting to be written, per tree file: [(relative_path, state)].
+# Whoever holds _TREE_LOCK writes all of them in one rewrite (see _flush_marks).
+_PENDING_MARKS: Dict[str, List[Tuple[str, str]]] = {}
+_PENDING_LOCK = threading.Lock()
+
+# Last read/written tree.md content per path: path -> ((mtime_ns, size), content)
+_TREE_CACHE: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_TREE_CACHE_LOCK = threading.Lock()
+
+# Yandex Disk folders already created (or found existing) in this process
+_REMOTE_FOLDERS = set()
+_REMOTE_FOLDERS_LOCK = threading.Lock()
+
+# Per-folder video listings saved by parse_folder_contents so a restarted run
+# skips re-scraping folders. Kept short: captured streaming URLs expire.
+_FOLDER_CACHE_DIRNAME = '.folder_cache'
+_FOLDER_CACHE_TTL = 60 * 60  # seconds
+
+# Web interface upload indicators (text= selectors can't be joined into one CSS list)
+_UPLOAD_DONE_SELECTORS = (
+    'text=/загрузка завершена/i',
+    'text=/upload complete/i',
+    'text=/файл загружен/i',
+    '.upload-complete',
+    '[data-testid="upload-complete"]',
+)
+_UPLOAD_ERROR_SELECTORS = (
+    'text=/ошибка/i',
+    'text=/error/i',
+    '.upload-error',
+    '[data-testid="upload-error"]',
+)
+
+# Seconds a page's cookie dict is reused by _get_cookie_dict
+_COOKIE_CACHE_TTL = 60
+
+# Cookie dicts per page: page -> (monotonic time read, cookie dict). Weakly keyed
+# so closed pages drop out; pages are only used from the main thread, so no lock.
+_COOKIE_CACHE = weakref.WeakKeyDictionary()
+
+# Read size for streamed downloads; large blocks keep the Python loop out of the way
+_DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# http.client asks PUT bodies for 8 KiB at a time; the body wrappers return
+# blocks of this size instead, and progress is redrawn at most every 0.2s
+_UPLOAD_CHUNK_SIZE = 4 << 20
+_PROGRESS_INTERVAL = 0.2
+
+# Extensions Yandex Disk throttles on API upload; uploaded as .txt and renamed back
+_RESTRICTED_UPLOAD_EXTENSIONS = frozenset(VIDEO_EXTENSIONS + ('.zip', '.rar', '.7z', '.tar', '.gz', '.db', '.sqlite', '.sqlite3'))
+
+_DOWNLOAD_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
 
 
 def filter_video_files(items: List[Dict]) -> List[Dict]:
@@ -39,7 +317,7 @@ def filter_video_files(items: List[Dict]) -> List[Dict]:
     video_files = []
     for item in items:
         name = item.get('name', '')
-        if any(name.endswith(ext) for ext in VIDEO_EXTENSIONS):
+        if name.endswith(VIDEO_EXTENSIONS):
             video_files.append(item)
     return video_files
 
@@ -51,9 +329,11 @@ def load_env_file() -> None:
         load_dotenv(env_path)
 
 
+@functools.lru_cache(maxsize=None)
 def get_oauth_token() -> str:
     """
     Get OAuth token from environment variable or .env file.
+    Cached after the first successful lookup; call load_env_file() first.
     
     Returns:
         OAuth token string
@@ -61,12 +341,13 @@ def get_oauth_token() -> str:
     Raises:
         ValueError: If token is not found
     """
-    token = os.getenv('YANDEX_OAUTH_TOKEN')
+    token = os.environ.get('YANDEX_OAUTH_TOKEN')
     if not token:
         raise ValueError("YANDEX_OAUTH_TOKEN not found in environment variables or .env file")
     return token
 
 
+@functools.lru_cache(maxsize=None)
 def get_public_folder_url() -> str:
     """
     Get public folder URL from environment variable or .env file.
@@ -77,12 +358,13 @@ def get_public_folder_url() -> str:
     Raises:
         ValueError: If URL is not found
     """
-    url = os.getenv('YANDEX_PUBLIC_FOLDER_URL')
+    url = os.environ.get('YANDEX_PUBLIC_FOLDER_URL')
     if not url:
         raise ValueError("YANDEX_PUBLIC_FOLDER_URL not found in environment variables or .env file")
     return url
 
 
+@functools.lru_cache(maxsize=None)
 def get_destination_path() -> str:
     """
     Get destination path from environment variable or .env file.
@@ -93,7 +375,7 @@ def get_destination_path() -> str:
     Raises:
         ValueError: If path is not found
     """
-    path = os.getenv('YANDEX_DESTINATION_PATH')
+    path = os.environ.get('YANDEX_DESTINATION_PATH')
     if not path:
         raise ValueError("YANDEX_DESTINATION_PATH not found in environment variables or .env file")
     return path
@@ -125,36 +407,350 @@ def validate_destination_path(path: str) -> bool:
     return path.startswith('/') and len(path) > 1
 
 
+def _block_unneeded_resources(context, page) -> None:
+    """
+    Block requests for resources the scraper never uses (web fonts).
+    
+    Uses Chromium's Network.setBlockedURLs rather than context.route: routing
+    disables the HTTP cache, so every folder navigation would download the
+    site's JS/CSS bundles again. Other browsers just load the fonts.
+    
+    Args:
+        context: Playwright browser context of the page
+        page: Playwright page to block fonts for
+    """
+    try:
+        session = context.new_cdp_session(page)
+        session.send('Network.enable')
+        session.send('Network.setBlockedURLs', {'urls': _BLOCKED_URL_PATTERNS})
+    except Exception:
+        pass
+
+
+def _wait_for_listing(page, timeout: int = 8000) -> None:
+    """
+    Wait until the folder listing has rendered, or until timeout.
+    
+    Returns as soon as listing elements appear instead of sleeping for a
+    fixed time; an empty folder or captcha page just runs into the timeout.
+    
+    Args:
+        page: Playwright page instance
+        timeout: Maximum wait in milliseconds
+    """
+    try:
+        page.wait_for_selector(_LISTING_READY_SELECTOR, timeout=timeout)
+    except PlaywrightTimeoutError:
+        pass
+
+
+def _is_captcha_present(page) -> bool:
+    """
+    Check whether the current page shows a captcha.
+    
+    Args:
+        page: Playwright page instance
+    
+    Returns:
+        True if a captcha element or captcha text is present, False otherwise
+    """
+    try:
+        present = bool(page.evaluate(_CAPTCHA_CHECK_JS, _CAPTCHA_SELECTOR))
+    except Exception:
+        return False
+    if present:
+        # Solving the captcha sets new cookies; don't hand out the old ones
+        _COOKIE_CACHE.pop(page, None)
+    return present
+
+
+def _is_stream_url(url: str) -> bool:
+    """
+    Check whether a request URL is a Yandex streaming video URL.
+    
+    Args:
+        url: Request URL
+    
+    Returns:
+        True for HLS playlists/segments and mp4 streams on the streaming host
+    """
+    return bool(_STREAM_HOST_RE.search(url) and _STREAM_PATH_RE.search(url))
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_chrome() -> Optional[str]:
+    """
+    Find a system Chrome/Chromium executable (looked up once per process).
+    
+    Returns:
+        Path to the browser executable, or None to use Playwright's Chromium
+    """
+    import shutil
+    chrome_paths = (
+        '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+        '/Applications/Chromium.app/Contents/MacOS/Chromium',
+        '/usr/bin/google-chrome',
+        '/usr/bin/chromium',
+    )
+    for path in chrome_paths:
+        if os.path.exists(path):
+            return path
+    # PATH lookups only when none of the well-known locations exist
+    for name in ('google-chrome', 'chromium', 'chromium-browser'):
+        path = shutil.which(name)
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def _get_cookie_dict(page, ttl: float = _COOKIE_CACHE_TTL) -> Dict[str, str]:
+    """
+    Get the page's browser cookies as a name -> value dict for requests.
+    
+    The dict is kept in _COOKIE_CACHE for ttl seconds, so consecutive downloads
+    from one folder share one browser round-trip. Callers must not modify it.
+    
+    Args:
+        page: Playwright page instance (main thread only)
+        ttl: Seconds before the cookies are read from the browser again
+    
+    Returns:
+        Dict of cookie names to values
+    """
+    cached = _COOKIE_CACHE.get(page)
+    now = time.monotonic()
+    if cached and now - cached[0] < ttl:
+        return cached[1]
+    cookie_dict = {cookie['name']: cookie['value'] for cookie in page.context.cookies()}
+    _COOKIE_CACHE[page] = (now, cookie_dict)
+    return cookie_dict
+
+
+class _BrowserPool:
+    """
+    Playwright and the browser, started once per process and shared by all callers.
+    
+    Each caller gets its own context from new_page(); the Chromium launch
+    (the slow part) only happens on first use or after the browser was closed.
+    """
+    
+    def __init__(self):
+        self._playwright = None
+        self._browser = None
+    
+    def _launch(self, verbose: bool) -> None:
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+        
+        # Try to use system Chrome instead of Chromium
+        try:
+            chrome_executable = _resolve_chrome()
+            if verbose and chrome_executable:
+                print(f"Using system browser: {chrome_executable}")
+            
+            self._browser = self._playwright.chromium.launch(
+                headless=False,
+                executable_path=chrome_executable,
+                args=[
+                    '--enable-features=VaapiVideoDecoder',
+                    '--use-gl=egl',
+                    '--enable-hardware-acceleration',
+                ]
+            )
+        except Exception as e:
+            if verbose:
+                print(f"Could not use system Chrome, using Playwright Chromium: {e}")
+            self._browser = self._playwright.chromium.launch(headless=False)
+    
+    def new_page(self, verbose: bool = False) -> Tuple[Any, Any, Any, Any]:
+        """
+        Open a page in a fresh context of the shared browser.
+        
+        Args:
+            verbose: Enable verbose output
+        
+        Returns:
+            Tuple of (playwright_instance, browser, context, page)
+        """
+        if self._browser is None or not self._browser.is_connected():
+            self._launch(verbose)
+        context = self._browser.new_context(
+            user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            viewport={'width': 1920, 'height': 1080},
+            java_script_enabled=True,
+        )
+        page = context.new_page()
+        _block_unneeded_resources(context, page)
+        return self._playwright, self._browser, context, page
+    
+    def close(self) -> None:
+        """Close the browser and stop Playwright (safe to call more than once)."""
+        if self._browser:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+
+_BROWSER_POOL = _BrowserPool()
+atexit.register(_BROWSER_POOL.close)
+
+
+def _close_quietly(resource) -> None:
+    """Close a Playwright context or browser, ignoring errors (it may already be gone)."""
+    with suppress(Exception):
+        resource.close()
+
+
+def _canon(url: str) -> Tuple[str, str, str]:
+    """
+    Build a dedup key for a folder URL.
+    
+    Args:
+        url: Absolute folder URL
+    
+    Returns:
+        (scheme, host, path) tuple without trailing slash, query or fragment
+    """
+    parts = urlsplit(url)
+    return (parts.scheme, parts.netloc.lower(), parts.path.rstrip('/'))
+
+
+def _capture_key(url: str) -> str:
+    """
+    Build a dedup key for a captured video URL.
+    
+    Args:
+        url: Captured request URL
+    
+    Returns:
+        URL without volatile query params and fragment
+    """
+    parts = urlsplit(url)
+    if not parts.query:
+        return urlunsplit(parts._replace(fragment=''))
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k not in _VOLATILE_QUERY_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query), fragment=''))
+
+
+def _site_base(folder_url: str) -> str:
+    """
+    Pick the site that relative links on a folder page resolve against.
+    
+    Args:
+        folder_url: Public folder URL
+    
+    Returns:
+        'https://disk.yandex.ru' or 'https://yadi.sk'
+    """
+    return 'https://disk.yandex.ru' if 'disk.yandex.ru' in folder_url else 'https://yadi.sk'
+
+
+def _absolute_url(href: str, site_base: str) -> Optional[str]:
+    """
+    Turn a scraped href into an absolute URL.
+    
+    Args:
+        href: Link as found on the page
+        site_base: Result of _site_base() for the folder being scraped
+    
+    Returns:
+        Absolute URL, or None if href is neither absolute nor site-relative
+    """
+    if href.startswith('/'):
+        return site_base + href
+    if href.startswith('http'):
+        return href
+    return None
+
+
+def _file_key(name: str) -> str:
+    """
+    Build a dedup key for a file name (Unicode-normalized, case-insensitive).
+    
+    Args:
+        name: File name as shown in the listing
+    
+    Returns:
+        Normalized file name
+    """
+    return unicodedata.normalize('NFC', name).strip().casefold()
+
+
+def _folder_cache_path(cache_dir: str, folder_url: str, folder_path: str) -> str:
+    """
+    Get the listing cache file for a folder.
+    
+    Args:
+        cache_dir: Local cache directory for downloads
+        folder_url: Folder URL
+        folder_path: Relative folder path (part of the cached items)
+    
+    Returns:
+        Path of the JSON cache file
+    """
+    key = hashlib.blake2b(f"{folder_url}\0{folder_path}".encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, _FOLDER_CACHE_DIRNAME, key + '.json')
+
+
+def _load_folder_cache(cache_file: str) -> Optional[List[Dict]]:
+    """
+    Load a cached folder listing if it exists and is fresh.
+    
+    Args:
+        cache_file: Path from _folder_cache_path()
+    
+    Returns:
+        List of video items, or None if missing, expired or unreadable
+    """
+    try:
+        if time.time() - os.path.getmtime(cache_file) > _FOLDER_CACHE_TTL:
+            return None
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_folder_cache(cache_file: str, items: List[Dict]) -> None:
+    """
+    Save a folder listing; written to a temp file first so a killed run never leaves half a file.
+    
+    Args:
+        cache_file: Path from _folder_cache_path()
+        items: Video items collected from the folder
+    """
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+
+
 def collect_all_folders(page, public_url: str, base_path: str, verbose: bool, processed_folder_urls: set) -> List[Dict]:
     """
     Collect all folders from current page WITHOUT entering them.
     Returns list of folder info: {'name': cleaned_name, 'url': full_url, 'path': folder_path}
+    Used by parse_public_folder (library entry point, not called from __main__).
     """
-    import re
     folders = []
+    site_base = _site_base(public_url)
     
     # Check for captcha first
-    captcha_selectors = [
-        'text=/[Рр]обот|[Cc]aptcha|[Пп]одтвердите/',
-        '[class*="captcha"]',
-        '[class*="Captcha"]',
-        '[id*="captcha"]',
-        '[id*="Captcha"]',
-        'iframe[src*="captcha"]',
-        'iframe[src*="smartcaptcha"]'
-    ]
-    
     captcha_solved = False
     while not captcha_solved:
-        captcha_found = False
-        for selector in captcha_selectors:
-            try:
-                elements = page.query_selector_all(selector)
-                if elements and len(elements) > 0:
-                    captcha_found = True
-                    break
-            except:
-                continue
+        captcha_found = _is_captcha_present(page)
         
         if captcha_found:
             print("\n" + "="*60)
@@ -163,18 +759,10 @@ def collect_all_folders(page, public_url: str, base_path: str, verbose: bool, pr
             print("After solving, press ENTER to continue...")
             print("="*60 + "\n")
             input("Press ENTER after solving captcha...")
-            page.wait_for_timeout(2000)
+            page.wait_for_load_state('domcontentloaded')
             
             # Check again if captcha is still present
-            captcha_still_present = False
-            for selector in captcha_selectors:
-                try:
-                    elements = page.query_selector_all(selector)
-                    if elements and len(elements) > 0:
-                        captcha_still_present = True
-                        break
-                except:
-                    continue
+            captcha_still_present = _is_captcha_present(page)
             
             if not captcha_still_present:
                 captcha_solved = True
@@ -182,80 +770,33 @@ def collect_all_folders(page, public_url: str, base_path: str, verbose: bool, pr
         else:
             captcha_solved = True
     
-    # Wait a bit for content to load after captcha
-    page.wait_for_timeout(2000)
-    
-    # Get all elements - need to query fresh after captcha/navigation
-    all_elements = page.query_selector_all(
-        'a[href*="/d/"], '
-        '.file-item, '
-        '[data-file-name], '
-        '.listing-item, '
-        '.resource-item, '
-        '.listing-item__title, '
-        '.listing-item__title-link, '
-        '.resource__name, '
-        '.resource__title, '
-        '.file__name, '
-        'a.resource__name-link, '
-        'a[class*="resource"], '
-        'a[class*="file"], '
-        'a[class*="listing"]'
-    )
+    # Wait for content to load after captcha
+    _wait_for_listing(page)
+    
+    # Read name and href of every listing element in a single round-trip
+    scrape_opts = dict(_SCRAPE_FILTER, kind='folders')
+    records = page.eval_on_selector_all(_LISTING_SELECTOR, _SCRAPE_ELEMENTS_JS, scrape_opts)
     
     if verbose:
-        print(f"    Found {len(all_elements)} elements with primary selectors")
+        print(f"    Found {len(records)} elements with primary selectors")
     
-    if len(all_elements) == 0:
-        all_elements = page.query_selector_all('a[href]')
+    if len(records) == 0:
+        records = page.eval_on_selector_all(_FALLBACK_SELECTOR, _SCRAPE_ELEMENTS_JS, scrape_opts)
         if verbose:
-            print(f"    Found {len(all_elements)} elements with fallback selector")
+            print(f"    Found {len(records)} elements with fallback selector")
     
-    # Process elements - re-query if navigation occurs
+    # Process elements
     processed_count = 0
-    for idx in range(len(all_elements)):
-        # Re-query elements if we've processed many (in case of navigation)
-        if idx > 0 and idx % 5 == 0:
-            try:
-                # Quick check if current element is still valid
-                test_elem = all_elements[idx]
-                test_elem.get_attribute('data-file-name')
-            except:
-                # Elements became invalid, re-query
-                if verbose:
-                    print(f"    Elements became invalid, re-querying...")
-                all_elements = page.query_selector_all(
-                    'a[href*="/d/"], '
-                    '.file-item, '
-                    '[data-file-name], '
-                    '.listing-item, '
-                    '.resource-item, '
-                    '.listing-item__title, '
-                    '.listing-item__title-link, '
-                    '.resource__name, '
-                    '.resource__title, '
-                    '.file__name, '
-                    'a.resource__name-link, '
-                    'a[class*="resource"], '
-                    'a[class*="file"], '
-                    'a[class*="listing"]'
-                )
-                if len(all_elements) == 0:
-                    all_elements = page.query_selector_all('a[href]')
-                if idx >= len(all_elements):
-                    break
-        
-        element = all_elements[idx]
+    seen_paths = set()
+    seen_names = set()
+    for record in records:
         processed_count += 1
+        # Files and ignored folders were already filtered out in the page
+        if not record:
+            continue
         try:
             # Get name
-            name = (element.get_attribute('data-file-name') or 
-                   element.get_attribute('data-resource-name') or
-                   element.get_attribute('data-name') or
-                   element.get_attribute('title') or
-                   element.get_attribute('aria-label') or
-                   element.inner_text() or
-                   element.text_content())
+            name = record['name']
             
             if not name:
                 continue
@@ -263,13 +804,13 @@ def collect_all_folders(page, public_url: str, base_path: str, verbose: bool, pr
             name = name.strip()
             
             # Skip ignored folders
-            if name in ['Аудио', 'Доки']:
+            if name in _IGNORED_FOLDERS:
                 continue
             
             # Check if it's a video file (has extension)
-            name_normalized = name.replace('\n', '').replace('\r', '').strip().lower()
-            has_video_ext = any(name_normalized.endswith(ext) for ext in VIDEO_EXTENSIONS)
-            has_file_ext = any(name_normalized.endswith(ext) for ext in ['.txt', '.pdf', '.doc', '.zip', '.rar', '.jpg', '.png', '.gif', '.json', '.xml', '.mp3', '.wav', '.ogg'])
+            name_normalized = name.translate(_NEWLINE_DROP).strip().lower()
+            has_video_ext = name_normalized.endswith(VIDEO_EXTENSIONS)
+            has_file_ext = name_normalized.endswith(_OTHER_FILE_EXTENSIONS)
             
             # If it has video extension, it's a file, not a folder
             if has_video_ext:
@@ -279,69 +820,29 @@ def collect_all_folders(page, public_url: str, base_path: str, verbose: bool, pr
             if has_file_ext:
                 continue
             
-            # Try to get href
-            href = element.get_attribute('href')
-            if not href:
-                parent_link = element.query_selector('a[href]')
-                if parent_link:
-                    href = parent_link.get_attribute('href')
-            
-            # If no href, try to get URL via click (but don't enter, just get URL)
-            if not href:
-                try:
-                    url_before = page.url
-                    # Try single click first to see if we can get href from navigation
-                    element.click(timeout=5000)
-                    page.wait_for_timeout(2000)
-                    current_url = page.url
-                    if current_url != url_before and '/d/' in current_url:
-                        href = current_url
-                        # Navigate back immediately
-                        page.goto(url_before, wait_until='domcontentloaded', timeout=15000)
-                        page.wait_for_timeout(2000)
-                    else:
-                        # If click didn't navigate, try double-click
-                        page.goto(url_before, wait_until='domcontentloaded', timeout=15000)
-                        page.wait_for_timeout(1000)
-                        element.dblclick(timeout=5000)
-                        page.wait_for_timeout(2000)
-                        current_url = page.url
-                        if current_url != url_before and '/d/' in current_url:
-                            href = current_url
-                            # Navigate back immediately
-                            page.goto(url_before, wait_until='domcontentloaded', timeout=15000)
-                            page.wait_for_timeout(2000)
-                except:
-                    # If we're already in a folder, try to go back
-                    try:
-                        if page.url != public_url:
-                            page.goto(public_url, wait_until='domcontentloaded', timeout=15000)
-                            page.wait_for_timeout(2000)
-                    except:
-                        pass
-                    continue
+            # Try to get href (own, child link, enclosing link or data attribute)
+            href = (record['href'] or record['child_href'] or
+                    record['closest_href'] or record['data_href'])
             
             if not href:
+                # Clicking into the element would cost two navigations; skip it instead
+                if verbose:
+                    print(f"    Warning: No link found for {name}, skipping")
                 continue
             
             # Construct full URL
-            if href.startswith('/'):
-                if 'disk.yandex.ru' in public_url or 'disk.yandex.ru' in href:
-                    full_url = f"https://disk.yandex.ru{href}"
-                else:
-                    full_url = f"https://yadi.sk{href}"
-            elif href.startswith('http'):
-                full_url = href
-            else:
+            full_url = _absolute_url(href, site_base)
+            if not full_url:
                 continue
             
             # Check if already processed
-            if full_url in processed_folder_urls:
+            url_key = _canon(full_url)
+            if url_key in processed_folder_urls:
                 continue
             
             # Clean folder name from date/time
-            name_normalized = name.replace('\n', ' ').replace('\r', ' ')
-            cleaned_name = re.sub(r'\s*\d{1,2}\.\d{1,2}\.\d{2,4}.*$', '', name_normalized).strip()
+            name_normalized = name.translate(_NEWLINE_TO_SPACE)
+            cleaned_name = _DATE_SUFFIX_RE.sub('', name_normalized).strip()
             if not cleaned_name or len(cleaned_name) < 2:
                 cleaned_name = name_normalized.strip()
             
@@ -352,14 +853,16 @@ def collect_all_folders(page, public_url: str, base_path: str, verbose: bool, pr
                 folder_path = cleaned_name
             
             # Check for duplicates
-            is_duplicate = any(f.get('path') == folder_path or f.get('name') == cleaned_name for f in folders)
+            is_duplicate = folder_path in seen_paths or cleaned_name in seen_names
             if not is_duplicate:
                 folders.append({
                     'name': cleaned_name,
                     'url': full_url,
                     'path': folder_path
                 })
-                processed_folder_urls.add(full_url)
+                seen_paths.add(folder_path)
+                seen_names.add(cleaned_name)
+                processed_folder_urls.add(url_key)
                 if verbose:
                     print(f"    Found folder: {cleaned_name}")
         except Exception as e:
@@ -384,40 +887,59 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
                          download_immediately: bool = False) -> List[Dict]:
     """
     Enter a folder and collect all video files from it.
-    If download_immediately is True, downloads and uploads videos immediately instead of adding to list.
+    If download_immediately is True, downloads and uploads videos immediately instead of adding to list
+    (on a background thread pool, so the next file is located while earlier ones transfer).
     Returns list of video items with relative_path (empty if download_immediately=True).
+    
+    The given page is reused for navigation (one browser/context per run), so
+    callers must not open a new page per folder.
+    
+    When collecting into a list with a cache_dir, a complete listing is cached
+    on disk for _FOLDER_CACHE_TTL and reused instead of opening the folder.
     """
     items = []
+    site_base = _site_base(folder_url)
+    
+    cache_file = None
+    if cache_dir and not download_immediately:
+        cache_file = _folder_cache_path(cache_dir, folder_url, folder_path)
+        cached_items = _load_folder_cache(cache_file)
+        if cached_items is not None:
+            if verbose:
+                print(f"  Using cached listing for {folder_path or '/'}: {len(cached_items)} video(s)")
+            return cached_items
+    parse_complete = False
+    
+    # Background download+upload jobs (download_immediately mode)
+    transfer_pool = ThreadPoolExecutor(max_workers=_TRANSFER_WORKERS) if download_immediately else None
+    transfers = []
+    # Set by the first transfer that fails (returns False or raises)
+    failed = threading.Event()
+    
+    def note_failure(transfer):
+        if not transfer.cancelled() and (transfer.exception() is not None or not transfer.result()):
+            failed.set()
+    
+    # Set when the main frame navigates, i.e. the element handles may be stale
+    stale = [False]
+    
+    def mark_stale(frame):
+        if frame == page.main_frame:
+            stale[0] = True
+    
+    page.on('framenavigated', mark_stale)
     
     try:
         # Navigate to folder
         if verbose:
             print(f"  Entering folder: {folder_path}")
         page.goto(folder_url, wait_until='domcontentloaded', timeout=60000)
-        page.wait_for_timeout(3000)
+        _wait_for_listing(page)
         
         # Check for captcha with loop (like in other functions)
-        captcha_selectors = [
-            'text=/[Рр]обот|[Cc]aptcha|[Пп]одтвердите/',
-            '[class*="captcha"]',
-            '[class*="Captcha"]',
-            '[id*="captcha"]',
-            '[id*="Captcha"]',
-            'iframe[src*="captcha"]',
-            'iframe[src*="smartcaptcha"]'
-        ]
-        
         captcha_solved = False
         while not captcha_solved:
-            captcha_found = False
-            for selector in captcha_selectors:
-                try:
-                    elements = page.query_selector_all(selector)
-                    if elements and len(elements) > 0:
-                        captcha_found = True
-                        break
-                except:
-                    continue
+            captcha_found = _is_captcha_present(page)
             
             if captcha_found:
                 print("\n" + "="*60)
@@ -426,50 +948,33 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
                 print("After solving, press ENTER to continue...")
                 print("="*60 + "\n")
                 input("Press ENTER after solving captcha...")
-                page.wait_for_timeout(3000)
+                page.wait_for_load_state('domcontentloaded')
                 
                 # Check again if captcha is still present
-                captcha_still_present = False
-                for selector in captcha_selectors:
-                    try:
-                        elements = page.query_selector_all(selector)
-                        if elements and len(elements) > 0:
-                            captcha_still_present = True
-                            break
-                    except:
-                        continue
+                captcha_still_present = _is_captcha_present(page)
                 
                 if not captcha_still_present:
                     captcha_solved = True
                     print("Captcha solved! Continuing...\n")
-                    # Wait a bit more for content to load
-                    page.wait_for_timeout(2000)
                     # Re-navigate to ensure page is fully loaded
                     page.goto(folder_url, wait_until='domcontentloaded', timeout=60000)
-                    page.wait_for_timeout(3000)
+                    _wait_for_listing(page)
             else:
                 captcha_solved = True
         
+        # Names/hrefs of the current elements, read in one round-trip by get_elements()
+        records = []
+        
         # Get all elements - re-query after captcha/navigation
         def get_elements():
-            elements = page.query_selector_all(
-                'a[href*="/d/"], '
-                '.file-item, '
-                '[data-file-name], '
-                '.listing-item, '
-                '.resource-item, '
-                '.listing-item__title, '
-                '.listing-item__title-link, '
-                '.resource__name, '
-                '.resource__title, '
-                '.file__name, '
-                'a.resource__name-link, '
-                'a[class*="resource"], '
-                'a[class*="file"], '
-                'a[class*="listing"]'
-            )
+            stale[0] = False
+            selector = _LISTING_SELECTOR
+            elements = page.query_selector_all(selector)
             if len(elements) == 0:
-                elements = page.query_selector_all('a[href]')
+                selector = _FALLBACK_SELECTOR
+                elements = page.query_selector_all(selector)
+            records[:] = page.eval_on_selector_all(selector, _SCRAPE_ELEMENTS_JS,
+                                                   dict(_SCRAPE_FILTER, kind='videos'))
             return elements
         
         all_elements = get_elements()
@@ -477,19 +982,50 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
         # Track processed file names to avoid duplicates
         processed_files = set()
         
+        # Video URLs requested after a Strategy 7 click; cleared before each click
+        video_urls = []
+        response_urls = []
+        # _capture_key -> (list, index) of the URL recorded for that video
+        captured_seen = {}
+        
+        def record_video_url(url):
+            if _CAPTCHA_URL_RE.search(url):
+                return
+            key = _capture_key(url)
+            if key in captured_seen:
+                # Same video re-requested with fresh ts/expiry: keep the newer URL
+                urls, idx = captured_seen[key]
+                urls[idx] = url
+                return
+            # Streaming URLs take priority over direct /d/ download URLs
+            urls = video_urls if _STREAM_HOST_RE.search(url) else response_urls
+            captured_seen[key] = (urls, len(urls))
+            urls.append(url)
+            if verbose:
+                print(f"    Captured video URL: {url[:100]}...")
+        
+        def capture_video_url(route):
+            record_video_url(route.request.url)
+            route.continue_()
+        
+        page.route(_VIDEO_REQUEST_RE, capture_video_url)
+        
+        # Every file of this folder shares the same local folder
+        if download_immediately and cache_dir:
+            folder_path_parts = [part for part in map(str.strip, folder_path.translate(_NEWLINE_TO_SPACE).split('/'))
+                                 if part]
+            local_folder_path = os.sep.join((cache_dir, *[sanitize_folder_name(part) for part in folder_path_parts]))
+            os.makedirs(local_folder_path, exist_ok=True)
+        
         file_idx = 0
         for idx in range(len(all_elements)):
+            # Stop queuing new files once a background transfer has failed
+            if failed.is_set():
+                raise Exception(f"Download or upload failed in {folder_path}. Script execution stopped.")
+            
             # Re-check for captcha periodically
             if idx > 0 and idx % 10 == 0:
-                captcha_found = False
-                for selector in captcha_selectors:
-                    try:
-                        elements = page.query_selector_all(selector)
-                        if elements and len(elements) > 0:
-                            captcha_found = True
-                            break
-                    except:
-                        continue
+                captcha_found = _is_captcha_present(page)
                 
                 if captcha_found:
                     print("\n" + "="*60)
@@ -498,65 +1034,32 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
                     print("After solving, press ENTER to continue...")
                     print("="*60 + "\n")
                     input("Press ENTER after solving captcha...")
-                    page.wait_for_timeout(3000)
+                    page.wait_for_load_state('domcontentloaded')
                     # Re-navigate and re-query elements
                     page.goto(folder_url, wait_until='domcontentloaded', timeout=60000)
-                    page.wait_for_timeout(3000)
+                    _wait_for_listing(page)
                     all_elements = get_elements()
                     if idx >= len(all_elements):
                         break
             
-            # Check if element is still valid, re-query if needed
-            if idx > 0 and idx % 5 == 0:
-                try:
-                    test_elem = all_elements[idx]
-                    test_elem.get_attribute('data-file-name')
-                except:
-                    # Elements became invalid, re-query
-                    if verbose:
-                        print(f"    Elements became invalid, re-querying...")
-                    all_elements = get_elements()
-                    if idx >= len(all_elements):
-                        break
+            # Re-query only if the page navigated since the last query
+            if stale[0]:
+                if verbose:
+                    print(f"    Page navigated, re-querying elements...")
+                all_elements = get_elements()
+                if idx >= len(all_elements):
+                    break
             
             element = all_elements[idx]
+            record = records[idx] if idx < len(records) else None
+            # Non-video elements were already filtered out in the page
+            if not record:
+                continue
             # Initialize saved_name at the beginning (will be used if context gets destroyed)
             saved_name = None
             try:
-                # Get name - handle potential navigation/context destruction
-                try:
-                    name = (element.get_attribute('data-file-name') or 
-                           element.get_attribute('data-resource-name') or
-                           element.get_attribute('data-name') or
-                           element.get_attribute('title') or
-                           element.get_attribute('aria-label') or
-                           element.inner_text() or
-                           element.text_content())
-                except Exception as context_error:
-                    error_str = str(context_error)
-                    if 'Execution context was destroyed' in error_str or 'Target closed' in error_str:
-                        if verbose:
-                            print(f"    Warning: Element context destroyed at index {idx}, re-querying elements...")
-                        all_elements = get_elements()
-                        if idx >= len(all_elements):
-                            break
-                        element = all_elements[idx]
-                        # Retry getting name
-                        try:
-                            name = (element.get_attribute('data-file-name') or 
-                                   element.get_attribute('data-resource-name') or
-                                   element.get_attribute('data-name') or
-                                   element.get_attribute('title') or
-                                   element.get_attribute('aria-label') or
-                                   element.inner_text() or
-                                   element.text_content())
-                        except:
-                            # Still failed, skip this element
-                            if verbose:
-                                print(f"    Warning: Could not get name after re-query, skipping...")
-                            continue
-                    else:
-                        raise
+                # Get name - read in the batch scrape, so no per-element round-trip
+                name = record.get('name')
                 
                 if not name:
                     continue
@@ -564,127 +1067,38 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
                 name = name.strip()
                 
                 # Skip ignored folders
-                if name in ['Аудио', 'Доки']:
+                if name in _IGNORED_FOLDERS:
                     continue
                 
                 # Check if it's a video file
-                name_normalized = name.replace('\n', '').replace('\r', '').strip().lower()
-                is_video = any(name_normalized.endswith(ext) for ext in VIDEO_EXTENSIONS)
+                name_normalized = name.translate(_NEWLINE_DROP).strip().lower()
+                is_video = name_normalized.endswith(VIDEO_EXTENSIONS)
                 
                 if not is_video:
                     continue  # Skip non-video files
                 
                 # Skip if we already processed this file
-                if name in processed_files:
+                file_key = _file_key(name)
+                if file_key in processed_files:
                     if verbose:
                         print(f"    Skipping {name}: already processed")
                     continue
                 
                 # Mark as being processed
-                processed_files.add(name)
+                processed_files.add(file_key)
                 
                 # Try to get href - multiple strategies
                 href = None
                 
-                # Strategy 1: Direct href attribute
-                try:
-                    href = element.get_attribute('href')
-                    if href and verbose:
-                        print(f"    Found href (direct): {href[:100]}...")
-                except Exception as e:
-                    if 'Execution context was destroyed' in str(e) or 'Target closed' in str(e):
+                # Strategies 1-6: link candidates read in the batch scrape, in order:
+                # own href, closest ancestor link, child link, data attributes,
+                # link with the same text
+                for source in ('href', 'closest_href', 'child_href', 'data_href', 'matched_href'):
+                    href = record.get(source)
+                    if href:
                         if verbose:
-                            print(f"    Warning: Context destroyed while getting href, re-querying...")
-                        all_elements = get_elements()
-                        if idx >= len(all_elements):
-                            break
-                        element = all_elements[idx]
-                        try:
-                            href = element.get_attribute('href')
-                        except:
-                            href = None
-                    else:
-                        href = None
-                
-                # Strategy 2: Parent link element (search up the tree)
-                if not href:
-                    try:
-                        # Try closest parent that is a link
-                        parent = element.evaluate_handle('el => el.closest("a[href]")')
-                        if parent:
-                            parent_element = parent.as_element()
-                            if parent_element:
-                                href = parent_element.get_attribute('href')
-                                if href and verbose:
-                                    print(f"    Found href (closest parent): {href[:100]}...")
-                    except Exception as e:
-                        if 'Execution context was destroyed' not in str(e) and 'Target closed' not in str(e):
-                            pass  # Ignore other errors
-                
-                # Strategy 3: Find parent link element using query_selector
-                if not href:
-                    try:
-                        # Try to find parent link
-                        current = element
-                        for _ in range(5):  # Check up to 5 levels up
-                            try:
-                                parent_elem = current.evaluate_handle('el => el.parentElement')
-                                if not parent_elem:
-                                    break
-                                parent = parent_elem.as_element()
-                                if parent:
-                                    tag_name = parent.evaluate('el => el.tagName')
-                                    if tag_name and tag_name.lower() == 'a':
-                                        href = parent.get_attribute('href')
-                                        if href:
-                                            if verbose:
-                                                print(f"    Found href (parent element): {href[:100]}...")
-                                            break
-                                    current = parent
-                                else:
-                                    break
-                            except:
-                                break
-                    except:
-                        pass
-                
-                # Strategy 4: Find child link element
-                if not href:
-                    try:
-                        child_link = element.query_selector('a[href]')
-                        if child_link:
-                            href = child_link.get_attribute('href')
-                            if href and verbose:
-                                print(f"    Found href (child): {href[:100]}...")
-                    except:
-                        pass
-                
-                # Strategy 5: Check data attributes for URL
-                if not href:
-                    try:
-                        data_href = element.get_attribute('data-href') or element.get_attribute('data-url') or element.get_attribute('data-link')
-                        if data_href:
-                            href = data_href
-                            if verbose:
-                                print(f"    Found href (data attribute): {href[:100]}...")
-                    except:
-                        pass
-                
-                # Strategy 6: Try to find link by searching for elements with the same name
-                if not href:
-                    try:
-                        # Find all links and match by text content
-                        all_links = page.query_selector_all('a[href]')
-                        for link in all_links:
-                            link_text = link.inner_text() or link.text_content() or link.get_attribute('title') or link.get_attribute('aria-label')
-                            if link_text and link_text.strip() == name:
-                                href = link.get_attribute('href')
-                                if href:
-                                    if verbose:
-                                        print(f"    Found href (matched link): {href[:100]}...")
-                                    break
-                    except:
-                        pass
+                            print(f"    Found href ({source}): {href[:100]}...")
+                        break
                 
                 # Strategy 7: For video files, try clicking to get streaming URL
                 if not href:
@@ -692,76 +1106,44 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
                     if not saved_name:
                         saved_name = name
                     try:
-                        video_urls = []
-                        response_urls = []
+                        video_urls.clear()
+                        response_urls.clear()
+                        captured_seen.clear()
                         page_url_before = page.url
                         url_found_via_navigation = False
                         
-                        def handle_request(request):
-                            url = request.url
-                            if 'captcha' in url.lower() or 'smartcaptcha' in url.lower():
-                                return
-                            if 'streaming.disk.yandex.net' in url or 'streaming.disk.yandex.ru' in url:
-                                if '/hls/' in url or url.endswith('.m3u8') or '.mp4' in url or '.m3u8' in url:
-                                    if url not in video_urls:
-                                        video_urls.append(url)
-                                        if verbose:
-                                            print(f"    Captured streaming URL (request): {url[:100]}...")
-                            # Also check for direct download URLs
-                            if '/d/' in url and any(url.endswith(ext) for ext in ['.mp4', '.avi', '.mkv', '.mov', '.webm']):
-                                if url not in response_urls:
-                                    response_urls.append(url)
-                                    if verbose:
-                                        print(f"    Captured download URL (request): {url[:100]}...")
-                        
-                        def handle_response(response):
-                            url = response.url
-                            if 'captcha' in url.lower() or 'smartcaptcha' in url.lower():
-                                return
-                            if 'streaming.disk.yandex.net' in url or 'streaming.disk.yandex.ru' in url:
-                                if '/hls/' in url or url.endswith('.m3u8') or '.mp4' in url or '.m3u8' in url:
-                                    if url not in response_urls:
-                                        response_urls.append(url)
-                                        if verbose:
-                                            print(f"    Captured streaming URL (response): {url[:100]}...")
-                            # Also check for direct download URLs
-                            if '/d/' in url and any(url.endswith(ext) for ext in ['.mp4', '.avi', '.mkv', '.mov', '.webm']):
-                                if url not in response_urls:
-                                    response_urls.append(url)
-                                    if verbose:
-                                        print(f"    Captured download URL (response): {url[:100]}...")
-                        
-                        # Register handlers BEFORE clicking
-                        page.on('request', handle_request)
-                        page.on('response', handle_response)
-                        
-                        # Try to click the element
+                        # Try to click the element (click() scrolls it into view itself)
                         try:
-                            element.scroll_into_view_if_needed()
-                            page.wait_for_timeout(500)
-                            
                             if verbose:
                                 print(f"    Clicking on {name} to get video URL...")
                             
-                            element.click(timeout=10000)
+                            # Return as soon as the player requests a video URL instead
+                            # of sleeping a fixed 5s; the capture route may not have run
+                            # yet, so record the matched request here as well
+                            clicked = False
+                            try:
+                                with page.expect_request(_VIDEO_REQUEST_RE, timeout=5000) as request_info:
+                                    element.click(timeout=10000)
+                                    clicked = True
+                                record_video_url(request_info.value.url)
+                            except PlaywrightTimeoutError:
+                                if not clicked:
+                                    raise
+                                # No video request within 5s: fall back to the page URL / DOM checks
                             
-                            # Wait longer for video to load and URLs to be captured
-                            page.wait_for_timeout(5000)  # Increased from 3000 to 5000
+                            # PRIORITY: Use captured streaming URLs first (they are the actual download URLs).
+                            # On this common path the page URL and DOM fallbacks below are skipped.
+                            if video_urls:
+                                href = video_urls[0]
+                                if verbose:
+                                    print(f"    ✓ Using captured streaming URL: {href[:100]}...")
+                            elif response_urls:
+                                href = response_urls[0]
+                                if verbose:
+                                    print(f"    ✓ Using captured download URL: {href[:100]}...")
                             
                             # Check if page URL changed (might be direct link)
-                            page_url_after = page.url
-                            
-                            # PRIORITY: Use captured streaming URLs first (they are the actual download URLs)
-                            # Only use page URL if no streaming URLs were captured
-                            if not href:
-                                if video_urls:
-                                    href = video_urls[0]
-                                    if verbose:
-                                        print(f"    ✓ Using captured streaming URL (request): {href[:100]}...")
-                                elif response_urls:
-                                    href = response_urls[0]
-                                    if verbose:
-                                        print(f"    ✓ Using captured streaming URL (response): {href[:100]}...")
+                            page_url_after = page.url if not href else None
                             
                             # If no streaming URL captured but page URL changed, use page URL as fallback
                             if not href and page_url_after != page_url_before and '/d/' in page_url_after:
@@ -773,7 +1155,7 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
                                 # Navigate back and wait for page to fully reload
                                 try:
                                     page.goto(page_url_before, wait_until='domcontentloaded', timeout=30000)
-                                    page.wait_for_timeout(2000)
+                                    _wait_for_listing(page)
                                     # Re-query elements after navigation to ensure they're valid
                                     all_elements = get_elements()
                                 except Exception as nav_error:
@@ -782,34 +1164,17 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
                                     # URL already found, continue with it
                                     pass
                             
-                            # Check for video element in DOM (only if URL not found yet)
-                            if not href:
-                                try:
-                                    video_elements = page.query_selector_all('video[src], video source[src]')
-                                    for video_elem in video_elements:
-                                        video_src = video_elem.get_attribute('src')
-                                        if video_src:
-                                            if 'streaming.disk.yandex' in video_src or '/d/' in video_src:
-                                                href = video_src
-                                                if verbose:
-                                                    print(f"    Found video src: {video_src[:100]}...")
-                                                break
-                                except:
-                                    pass
-                            
-                            # Check for iframe with video (only if URL not found yet)
+                            # Check video and iframe sources in the DOM (only if URL not found yet);
+                            # one snapshot, <video> sources first as before
                             if not href:
-                                try:
-                                    iframes = page.query_selector_all('iframe[src]')
-                                    for iframe in iframes:
-                                        iframe_src = iframe.get_attribute('src')
-                                        if iframe_src and ('streaming.disk.yandex' in iframe_src or '/d/' in iframe_src):
-                                            href = iframe_src
+                                with suppress(Exception):
+                                    for media in page.evaluate(_MEDIA_SOURCES_JS):
+                                        media_src = media['src']
+                                        if media_src and _VIDEO_LINK_RE.search(media_src):
+                                            href = media_src
                                             if verbose:
-                                                print(f"    Found iframe src: {iframe_src[:100]}...")
+                                                print(f"    Found {media['tag'].lower()} src: {media_src[:100]}...")
                                             break
-                                except:
-                                    pass
                             
                             # If we found a URL, close overlay and ensure we're on the right page
                             if href:
@@ -819,34 +1184,23 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
                                 
                                 if verbose:
                                     print(f"    ✓ URL found for {saved_name_for_item}, preparing to add to list...")
-                                try:
+                                with suppress(Exception):
                                     page.keyboard.press('Escape')
                                     page.wait_for_timeout(500)
-                                except:
-                                    pass
                                 
-                                # If page URL changed but we found URL via request/response, navigate back
-                                if not url_found_via_navigation and page_url_after != page_url_before:
-                                    if verbose:
-                                        print(f"    Navigating back to folder page...")
+                                # If the click left the folder page but we found the URL via
+                                # request/response, navigate back (one page.url read after Escape)
+                                if not url_found_via_navigation:
                                     try:
-                                        page.goto(page_url_before, wait_until='domcontentloaded', timeout=30000)
-                                        page.wait_for_timeout(2000)
-                                        all_elements = get_elements()
+                                        if page.url != page_url_before:
+                                            if verbose:
+                                                print(f"    Navigating back to folder page...")
+                                            page.goto(page_url_before, wait_until='domcontentloaded', timeout=30000)
+                                            _wait_for_listing(page)
+                                            all_elements = get_elements()
                                     except Exception as nav_err:
                                         if verbose:
                                             print(f"    Warning during navigation back: {nav_err}")
-                                        pass
-                                # If page URL didn't change, make sure we're still on the folder page
-                                elif page_url_after == page_url_before:
-                                    try:
-                                        current_url = page.url
-                                        if current_url != page_url_before:
-                                            page.goto(page_url_before, wait_until='domcontentloaded', timeout=30000)
-                                            page.wait_for_timeout(2000)
-                                            all_elements = get_elements()
-                                    except:
-                                        pass
                                 
                                 # Restore href and name after navigation (they might have been lost)
                                 href = saved_href
@@ -915,14 +1269,8 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
                             print(f"    Warning: Error in debug output: {debug_error}")
                     
                     # Construct full URL first (before using name)
-                    if href.startswith('/'):
-                        if 'disk.yandex.ru' in folder_url or 'disk.yandex.ru' in href:
-                            full_url = f"https://disk.yandex.ru{href}"
-                        else:
-                            full_url = f"https://yadi.sk{href}"
-                    elif href.startswith('http'):
-                        full_url = href
-                    else:
+                    full_url = _absolute_url(href, site_base)
+                    if not full_url:
                         if verbose:
                             print(f"    Warning: Invalid href format, skipping...")
                         continue
@@ -940,86 +1288,39 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
                     
                     # If download_immediately is True, download and upload immediately
                     if download_immediately and cache_dir and tree_file_path:
-                        try:
-                            # Build local path
-                            path_parts = [part.strip().replace('\n', ' ').replace('\r', ' ') 
-                                         for part in relative_path.split('/') if part.strip()]
-                            sanitized_parts = [sanitize_folder_name(part) if i < len(path_parts) - 1 
-                                              else sanitize_filename(part) 
-                                              for i, part in enumerate(path_parts)]
-                            
-                            if len(path_parts) > 1:
-                                folder_parts = sanitized_parts[:-1]
-                                local_folder_path = os.path.join(cache_dir, *folder_parts)
-                                os.makedirs(local_folder_path, exist_ok=True)
-                            
-                            local_path = os.path.join(cache_dir, *sanitized_parts)
-                            
-                            # Check if already downloaded
-                            is_fully_downloaded, is_partially_downloaded = is_file_downloaded(
-                                relative_path, tree_file_path)
-                            
-                            if is_fully_downloaded:
-                                if verbose:
-                                    print(f"    Skipping {relative_path} - already fully downloaded")
-                                continue
-                            
-                            # Download video
-                            if not is_partially_downloaded or not os.path.exists(local_path):
-                                if verbose:
-                                    print(f"\n    Downloading {relative_path} immediately...")
-                                if not download_video(full_url, local_path, verbose, page):
-                                    print(f"ERROR: Failed to download {relative_path}")
-                                    raise Exception(f"Download failed for {relative_path}. Script execution stopped.")
-                                
-                                mark_file_partially_downloaded(relative_path, tree_file_path, verbose)
-                                if verbose:
-                                    print(f"    ✓ Downloaded: {relative_path}")
-                            
-                            # Upload to Yandex Disk if destination_path and oauth_token provided
-                            if destination_path and oauth_token:
-                                clean_relative_path = relative_path.lstrip('/')
-                                if destination_path.endswith('/'):
-                                    full_destination = f"{destination_path}{clean_relative_path}"
-                                else:
-                                    full_destination = f"{destination_path}/{clean_relative_path}"
-                                
-                                if verbose:
-                                    print(f"    Uploading {relative_path} to {full_destination}...")
-                                
-                                # Create folder structure
-                                if len(path_parts) > 1:
-                                    folder_path_for_upload = '/'.join(path_parts[:-1])
-                                    folder_path_for_upload = folder_path_for_upload.lstrip('/')
-                                    create_folder_structure(destination_path, folder_path_for_upload, 
-                                                           oauth_token, verbose)
-                                
-                                if not upload_to_yandex_disk(local_path, full_destination, oauth_token, 
-                                                           verbose, use_web_interface=False, page=page):
-                                    print(f"ERROR: Failed to upload {relative_path}")
-                                    raise Exception(f"Upload failed for {relative_path}. Script execution stopped.")
-                                
-                                mark_file_downloaded(relative_path, tree_file_path, verbose)
-                                if verbose:
-                                    print(f"    ✓ Uploaded: {relative_path}")
-                                
-                                # Delete local file after successful upload
-                                try:
-                                    os.remove(local_path)
-                                    if verbose:
-                                        print(f"    Deleted local file: {local_path}")
-                                except Exception as e:
-                                    if verbose:
-                                        print(f"    Warning: Could not delete local file: {e}")
-                            else:
-                                if verbose:
-                                    print(f"    Note: Upload skipped (no destination_path or oauth_token)")
-                            
-                            # Continue to next file (don't add to items list)
+                        # Build local path (folder part prepared once per folder)
+                        file_part = name.strip().translate(_NEWLINE_TO_SPACE)
+                        path_parts = folder_path_parts + [file_part]
+                        local_path = os.path.join(local_folder_path, sanitize_filename(file_part))
+                        
+                        # Check if already downloaded
+                        is_fully_downloaded, is_partially_downloaded = is_file_downloaded(
+                            relative_path, tree_file_path)
+                        
+                        if is_fully_downloaded:
+                            if verbose:
+                                print(f"    Skipping {relative_path} - already fully downloaded")
                             continue
-                        except Exception as download_error:
-                            print(f"ERROR: Failed to process {relative_path}: {download_error}")
-                            raise  # Re-raise to stop execution
+                        
+                        # Download+upload runs in the background while the page moves
+                        # on to the next file; cookies are read here, on the Playwright thread
+                        job = {
+                            'relative_path': relative_path,
+                            'download_url': full_url,
+                            'local_path': local_path,
+                            'path_parts': path_parts,
+                            'skip_download': is_partially_downloaded,
+                        }
+                        cookies = _get_cookie_dict(page)
+                        transfer = transfer_pool.submit(_transfer_video, job, tree_file_path,
+                                                        destination_path, oauth_token, cookies, verbose)
+                        transfer.add_done_callback(note_failure)
+                        transfers.append(transfer)
+                        if verbose:
+                            print(f"    Queued download/upload: {relative_path}")
+                        
+                        # Continue to next file (don't add to items list)
+                        continue
                     
                     # Original code: add to items list if not downloading immediately
                     if verbose:
@@ -1054,15 +1355,7 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
                         relative_path = f"{folder_path}/{item_name}"
                         
                         # Construct full URL
-                        if href.startswith('/'):
-                            if 'disk.yandex.ru' in folder_url or 'disk.yandex.ru' in href:
-                                full_url = f"https://disk.yandex.ru{href}"
-                            else:
-                                full_url = f"https://yadi.sk{href}"
-                        elif href.startswith('http'):
-                            full_url = href
-                        else:
-                            full_url = href
+                        full_url = _absolute_url(href, site_base) or href
                         
                         items.append({
                             'name': item_name,
@@ -1092,8 +1385,14 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
                         print(f"    Warning: Could not process element: {e}")
                     continue
         
+        # Wait for the queued transfers; any failure stops execution as before
+        for transfer in as_completed(transfers):
+            if not transfer.result():
+                raise Exception(f"Download or upload failed in {folder_path}. Script execution stopped.")
+        
         if verbose:
             print(f"  Found {len(items)} video(s) in {folder_path}")
+        parse_complete = True
     except Exception as e:
         # If it's a critical error about missing download URL or download/upload failure, re-raise it
         error_msg = str(e)
@@ -1109,6 +1408,19 @@ def parse_folder_contents(page, folder_url: str, folder_path: str, verbose: bool
         if download_immediately:
             print(f"ERROR: Parsing error in folder {folder_path}: {e}")
             raise Exception(f"Parsing error: {e}. Script execution stopped.")
+    finally:
+        if transfer_pool:
+            transfer_pool.shutdown(wait=True, cancel_futures=True)
+        # The page is reused for the next folder, so drop this folder's route and listener
+        page.remove_listener('framenavigated', mark_stale)
+        try:
+            page.unroute(_VIDEO_REQUEST_RE)
+        except Exception:
+            pass
+    
+    # Empty results are not cached: they usually mean the listing did not load
+    if cache_file and parse_complete and items:
+        _save_folder_cache(cache_file, items)
     
     return items
 
@@ -1130,13 +1442,15 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
         destination_path: Yandex Disk destination path (optional)
         oauth_token: Yandex Disk OAuth token (optional)
     """
+    site_base = _site_base(folder_url)
+    
     # Navigate to folder
     if verbose:
         print(f"  Processing folder: {folder_path}")
     
     try:
         page.goto(folder_url, wait_until='domcontentloaded', timeout=60000)
-        page.wait_for_timeout(3000)
+        _wait_for_listing(page)
     except Exception as e:
         if verbose:
             print(f"  Error navigating to folder: {e}")
@@ -1169,17 +1483,11 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
         for element in all_elements:
             try:
                 # Try to get name to check for duplicates
-                name = (element.get_attribute('data-file-name') or 
-                       element.get_attribute('data-resource-name') or
-                       element.get_attribute('data-name') or
-                       element.get_attribute('title') or
-                       element.get_attribute('aria-label') or
-                       element.inner_text() or
-                       element.text_content())
+                name = element.evaluate(_ELEMENT_NAME_JS)
                 
                 if name:
                     # Clean name: remove newlines and carriage returns, normalize whitespace
-                    name = name.replace('\n', '').replace('\r', '').strip()
+                    name = name.translate(_NEWLINE_DROP).strip()
                     name = re.sub(r'\s+', ' ', name)
                     if name in seen_names:
                         if verbose:
@@ -1198,6 +1506,7 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
     # Process videos one by one
     processed_count = 0
     processed_in_session = set()  # Track files processed in this session to avoid duplicates
+    local_folders = set()  # Local folders already created for earlier files
     
     while True:
         # Get current list of elements
@@ -1220,19 +1529,13 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
         for element in all_elements:
             try:
                 # Get name
-                name = (element.get_attribute('data-file-name') or 
-                       element.get_attribute('data-resource-name') or
-                       element.get_attribute('data-name') or
-                       element.get_attribute('title') or
-                       element.get_attribute('aria-label') or
-                       element.inner_text() or
-                       element.text_content())
+                name = element.evaluate(_ELEMENT_NAME_JS)
                 
                 if not name:
                     continue
                 
                 # Clean name: remove newlines and carriage returns, normalize whitespace
-                name = name.replace('\n', '').replace('\r', '').strip()
+                name = name.translate(_NEWLINE_DROP).strip()
                 # Replace multiple spaces with single space
                 name = re.sub(r'\s+', ' ', name)
                 
@@ -1240,7 +1543,7 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
                 
                 # Check if it's a video file (after cleaning)
                 name_normalized = name.lower().strip()
-                if not any(name_normalized.endswith(ext) for ext in VIDEO_EXTENSIONS):
+                if not name_normalized.endswith(VIDEO_EXTENSIONS):
                     skipped_not_video += 1
                     if verbose:
                         print(f"    DEBUG: Non-video file: {name}")
@@ -1306,12 +1609,11 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
         
         # CRITICAL: Add file to tree.md IMMEDIATELY after finding it (before download)
         try:
-            with open(tree_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = _read_tree(tree_file_path)
             
             # Check if file is already in tree.md
-            file_pattern = rf'- \[[px ]\] `{re.escape(relative_path)}`'
-            file_found_in_tree = re.search(file_pattern, content)
+            file_pattern = _path_patterns(relative_path)['listed'].pattern
+            file_found_in_tree = _path_patterns(relative_path)['listed'].search(content)
             
             if verbose:
                 print(f"    DEBUG: Checking if {relative_path} is in tree.md...")
@@ -1321,22 +1623,20 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
             if not file_found_in_tree:
                 # Add file to tree.md
                 # Find the "## Файлы" section
-                files_section_match = re.search(r'## Файлы\n\n', content)
+                files_section_match = _FILES_HEADER_RE.search(content)
                 if files_section_match:
                     insert_pos = files_section_match.end()
                     new_line = f"- [ ] `{relative_path}`\n"
                     content = content[:insert_pos] + new_line + content[insert_pos:]
                     
-                    with open(tree_file_path, 'w', encoding='utf-8') as f:
-                        f.write(content)
+                    _atomic_write(tree_file_path, content)
                     if verbose:
                         print(f"    ✓ Added {relative_path} to tree.md")
                 else:
                     # If "## Файлы" section doesn't exist, add it
                     content += "\n## Файлы\n\n"
                     content += f"- [ ] `{relative_path}`\n"
-                    with open(tree_file_path, 'w', encoding='utf-8') as f:
-                        f.write(content)
+                    _atomic_write(tree_file_path, content)
                     if verbose:
                         print(f"    ✓ Added {relative_path} to tree.md (created Файлы section)")
             else:
@@ -1360,7 +1660,7 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
             # Strategy 1: Direct href attribute
             try:
                 href = video_element.get_attribute('href')
-                if href and ('streaming.disk.yandex' in href or '/d/' in href):
+                if href and _VIDEO_LINK_RE.search(href):
                     if verbose:
                         print(f"    Found href: {href[:100]}...")
             except:
@@ -1370,48 +1670,53 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
             if not href:
                 try:
                     video_urls = []
-                    response_urls = []
+                    video_seen = {}
                     page_url_before = page.url
                     
-                    def handle_request(request):
-                        url = request.url
-                        if 'streaming.disk.yandex.net' in url or 'streaming.disk.yandex.ru' in url:
-                            if '/hls/' in url or url.endswith('.m3u8'):
-                                if url not in video_urls:
-                                    video_urls.append(url)
-                                    if verbose:
-                                        print(f"    Captured streaming URL (request): {url[:100]}...")
-                    
-                    def handle_response(response):
-                        url = response.url
-                        if 'streaming.disk.yandex.net' in url or 'streaming.disk.yandex.ru' in url:
-                            if '/hls/' in url or url.endswith('.m3u8'):
-                                if url not in response_urls:
-                                    response_urls.append(url)
-                                    if verbose:
-                                        print(f"    Captured streaming URL (response): {url[:100]}...")
-                    
-                    page.on('request', handle_request)
-                    page.on('response', handle_response)
+                    def capture_stream(route):
+                        url = route.request.url
+                        if _is_stream_url(url):
+                            key = _capture_key(url)
+                            if key in video_seen:
+                                # Keep the newest URL for a re-requested video
+                                video_urls[video_seen[key]] = url
+                            else:
+                                video_seen[key] = len(video_urls)
+                                video_urls.append(url)
+                                if verbose:
+                                    print(f"    Captured streaming URL: {url[:100]}...")
+                        route.continue_()
                     
-                    video_element.scroll_into_view_if_needed()
-                    page.wait_for_timeout(500)
-                    video_element.click(timeout=10000)
-                    page.wait_for_timeout(5000)
+                    page.route(_STREAM_REQUEST_RE, capture_stream)
+                    try:
+                        # click() waits for the element to be actionable, no settle sleep needed
+                        video_element.scroll_into_view_if_needed()
+                        # Return as soon as the player requests a stream instead of sleeping
+                        # a fixed 5s; the route may not have run yet, so record it here too
+                        clicked = False
+                        try:
+                            with page.expect_request(_STREAM_REQUEST_RE, timeout=5000) as request_info:
+                                video_element.click(timeout=10000)
+                                clicked = True
+                            url = request_info.value.url
+                            if _is_stream_url(url) and _capture_key(url) not in video_seen:
+                                video_seen[_capture_key(url)] = len(video_urls)
+                                video_urls.append(url)
+                        except PlaywrightTimeoutError:
+                            if not clicked:
+                                raise
+                    finally:
+                        page.unroute(_STREAM_REQUEST_RE, capture_stream)
                     
                     if video_urls:
                         href = video_urls[0]
                         if verbose:
                             print(f"    ✓ Using captured streaming URL: {href[:100]}...")
-                    elif response_urls:
-                        href = response_urls[0]
-                        if verbose:
-                            print(f"    ✓ Using captured streaming URL (response): {href[:100]}...")
                     
                     # Navigate back
                     try:
                         page.goto(page_url_before, wait_until='domcontentloaded', timeout=30000)
-                        page.wait_for_timeout(2000)
+                        _wait_for_listing(page)
                     except:
                         pass
                         
@@ -1424,30 +1729,26 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
                 raise Exception(f"Cannot find download URL for {relative_path}. Script execution stopped.")
             
             # Construct full URL
-            if href.startswith('/'):
-                if 'disk.yandex.ru' in folder_url or 'disk.yandex.ru' in href:
-                    full_url = f"https://disk.yandex.ru{href}"
-                else:
-                    full_url = f"https://yadi.sk{href}"
-            elif href.startswith('http'):
-                full_url = href
-            else:
+            full_url = _absolute_url(href, site_base)
+            if not full_url:
                 print(f"ERROR: Invalid href format for {relative_path}")
                 raise Exception(f"Invalid href format. Script execution stopped.")
             
             # Build local path
-            path_parts = [part.strip().replace('\n', ' ').replace('\r', ' ') 
-                         for part in relative_path.split('/') if part.strip()]
+            path_parts = [part for part in map(str.strip, relative_path.translate(_NEWLINE_TO_SPACE).split('/'))
+                          if part]
             sanitized_parts = [sanitize_folder_name(part) if i < len(path_parts) - 1 
                               else sanitize_filename(part) 
                               for i, part in enumerate(path_parts)]
             
+            # Plain separator join: the parts are already sanitized, so
+            # os.path.join's per-part checks buy nothing here
+            local_path = os.sep.join((cache_dir, *sanitized_parts))
             if len(path_parts) > 1:
-                folder_parts = sanitized_parts[:-1]
-                local_folder_path = os.path.join(cache_dir, *folder_parts)
-                os.makedirs(local_folder_path, exist_ok=True)
-            
-            local_path = os.path.join(cache_dir, *sanitized_parts)
+                local_folder_path = os.path.dirname(local_path)
+                if local_folder_path not in local_folders:
+                    os.makedirs(local_folder_path, exist_ok=True)
+                    local_folders.add(local_folder_path)
             
             # Check if already downloaded
             is_fully_downloaded, is_partially_downloaded = is_file_downloaded(
@@ -1459,6 +1760,35 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
                 processed_count += 1
                 continue
             
+            upload_enabled = bool(destination_path and oauth_token)
+            if upload_enabled:
+                clean_relative_path = relative_path.lstrip('/')
+                if destination_path.endswith('/'):
+                    full_destination = f"{destination_path}{clean_relative_path}"
+                else:
+                    full_destination = f"{destination_path}/{clean_relative_path}"
+                
+                # Create folder structure
+                if len(path_parts) > 1:
+                    folder_path_for_upload = '/'.join(path_parts[:-1])
+                    folder_path_for_upload = folder_path_for_upload.lstrip('/')
+                    create_folder_structure(destination_path, folder_path_for_upload, 
+                                           oauth_token, verbose)
+            
+            # Direct video URL: pipe the download into the upload, no local copy
+            if upload_enabled and not is_partially_downloaded and full_url.lower().endswith(VIDEO_EXTENSIONS):
+                if verbose:
+                    print(f"    Streaming {relative_path} to {full_destination}...")
+                cookies = _get_cookie_dict(page)
+                if upload_stream_to_yandex_disk(full_url, full_destination, oauth_token, cookies, verbose):
+                    mark_file_downloaded(relative_path, tree_file_path, verbose)
+                    if verbose:
+                        print(f"    ✓ Uploaded: {relative_path}")
+                    processed_in_session.add(relative_path)
+                    processed_count += 1
+                    continue
+                print(f"Warning: Streamed transfer of {relative_path} failed, falling back to local download...")
+            
             # Download video
             if not is_partially_downloaded or not os.path.exists(local_path):
                 if verbose:
@@ -1472,23 +1802,10 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
                     print(f"    ✓ Downloaded: {relative_path}")
             
             # Upload to Yandex Disk if destination_path and oauth_token provided
-            if destination_path and oauth_token:
-                clean_relative_path = relative_path.lstrip('/')
-                if destination_path.endswith('/'):
-                    full_destination = f"{destination_path}{clean_relative_path}"
-                else:
-                    full_destination = f"{destination_path}/{clean_relative_path}"
-                
+            if upload_enabled:
                 if verbose:
                     print(f"    Uploading {relative_path} to {full_destination}...")
                 
-                # Create folder structure
-                if len(path_parts) > 1:
-                    folder_path_for_upload = '/'.join(path_parts[:-1])
-                    folder_path_for_upload = folder_path_for_upload.lstrip('/')
-                    create_folder_structure(destination_path, folder_path_for_upload, 
-                                           oauth_token, verbose)
-                
                 if not upload_to_yandex_disk(local_path, full_destination, oauth_token, 
                                            verbose, use_web_interface=False, page=page):
                     print(f"ERROR: Failed to upload {relative_path}")
@@ -1519,10 +1836,7 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
             
             processed_count += 1
             
-            # After successful processing, wait a bit before next iteration
-            # This ensures tree.md is updated and we can find next file
-            page.wait_for_timeout(1000)
-            
+            # tree.md marks are written synchronously, so the check below sees them
             # Verify file is marked as downloaded in tree.md
             is_fully_downloaded_after, _ = is_file_downloaded(relative_path, tree_file_path)
             if verbose:
@@ -1539,6 +1853,181 @@ def process_videos_sequentially(page, folder_url: str, folder_path: str, verbose
         print(f"  Processed {processed_count} video(s) from {folder_path}")
 
 
+def _collect_subfolders(page, folders: List[Dict], verbose: bool, processed_folder_urls: set) -> List[Dict]:
+    """
+    Collect all folders below the given ones, walking the tree breadth-first.
+    
+    Args:
+        page: Playwright page instance (reused for every folder)
+        folders: Already collected folders whose subfolders should be found
+        verbose: Enable verbose output
+        processed_folder_urls: Set of already processed folder URL keys (see _canon)
+    
+    Returns:
+        List of folder info dicts ({'name', 'url', 'path'}) in breadth-first order
+    """
+    found = []
+    visited = set()
+    queue = deque(folders)
+    while queue:
+        folder = queue.popleft()
+        # Never open the same folder twice, even if a share links back into itself
+        folder_key = _canon(folder['url'])
+        if folder_key in visited:
+            continue
+        visited.add(folder_key)
+        try:
+            if verbose:
+                print(f"Navigating to subfolder: {folder['url']}")
+            page.goto(folder['url'], wait_until='domcontentloaded', timeout=60000)
+            _wait_for_listing(page)
+            # collect_all_folders handles a captcha on this page itself
+            subfolders = collect_all_folders(page, folder['url'], folder['path'], verbose, processed_folder_urls)
+        except Exception as e:
+            if verbose:
+                print(f"  Warning: Could not collect folders from {folder['path']}: {e}")
+            continue
+        if verbose:
+            print(f"  Found {len(subfolders)} folder(s) in {folder['path']}")
+        found.extend(subfolders)
+        queue.extend(subfolders)
+    return found
+
+
+def list_public_resources(public_key: str, path: str = '/', oauth_token: Optional[str] = None) -> List[Dict]:
+    """
+    List a public Yandex Disk folder through the REST API.
+    
+    Args:
+        public_key: Public folder URL (or its public key)
+        path: Path inside the public folder
+        oauth_token: OAuth token (optional, raises rate limits)
+    
+    Returns:
+        Child resources ('name', 'type', 'path' and, for files, 'file' download link)
+    
+    Raises:
+        requests.RequestException: On API or network error
+    """
+    headers = {'Authorization': f'OAuth {oauth_token}'} if oauth_token else {}
+    resources = []
+    offset = 0
+    while True:
+        response = _SESSION.get(_PUBLIC_RESOURCES_API, headers=headers, timeout=30, params={
+            'public_key': public_key,
+            'path': path,
+            'limit': _PUBLIC_LISTING_LIMIT,
+            'offset': offset,
+            'fields': '_embedded.total,_embedded.items.name,_embedded.items.type,'
+                      '_embedded.items.path,_embedded.items.file',
+        })
+        response.raise_for_status()
+        embedded = response.json().get('_embedded', {})
+        batch = embedded.get('items', [])
+        resources.extend(batch)
+        offset += len(batch)
+        if not batch or offset >= embedded.get('total', 0):
+            return resources
+
+
+def _parse_public_folder_api(public_url: str, base_path: str, verbose: bool,
+                             test_mode: bool = False) -> Optional[Tuple[List[Dict], List[Dict]]]:
+    """
+    Collect folders and video files of a public folder with the REST API.
+    
+    Walks the same tree as parse_public_folder (breadth-first, ignored folders
+    skipped, date suffixes cut from folder names) with one request per folder
+    instead of a page load.
+    
+    Args:
+        public_url: Public folder URL
+        base_path: Base path for relative paths
+        verbose: Enable verbose output
+        test_mode: If True, do not descend below the first folder level
+    
+    Returns:
+        Tuple of (items, folder_info), or None if the API could not be used
+        (including when a video has no download link, e.g. downloads disabled)
+    """
+    items = []
+    folder_info = []
+    level = [('/', base_path, 0)]
+    try:
+        with ThreadPoolExecutor(max_workers=_LISTING_WORKERS) as executor:
+            while level:
+                # Fetch the whole level at once; results come back in level order
+                listings = executor.map(lambda entry: list_public_resources(public_url, entry[0]), level)
+                next_level = []
+                for (api_path, folder_path, depth), listing in zip(level, listings):
+                    if verbose:
+                        print(f"  Listed {folder_path or '/'} via API ({len(listing)} entries)")
+                    _add_public_listing(listing, public_url, folder_path, depth, test_mode,
+                                        items, folder_info, next_level)
+                level = next_level
+    except Exception as e:
+        if verbose:
+            print(f"  Public API listing failed ({e}), falling back to the browser")
+        return None
+    
+    if verbose:
+        print(f"  Found {len(folder_info)} folder(s) and {len(items)} video(s) via API")
+    return items, folder_info
+
+
+def _add_public_listing(listing: List[Dict], public_url: str, folder_path: str, depth: int, test_mode: bool,
+                        items: List[Dict], folder_info: List[Dict], next_level: List[Tuple]) -> None:
+    """
+    Sort one API folder listing into video items and subfolders to visit.
+    
+    Args:
+        listing: Resources returned by list_public_resources
+        public_url: Public folder URL (base of the subfolder URLs)
+        folder_path: Relative path of the listed folder
+        depth: Folder depth below the public root
+        test_mode: If True, do not descend below the first folder level
+        items: Video items list to extend
+        folder_info: Folder info list to extend
+        next_level: Subfolders to list next, as (api_path, folder_path, depth)
+    
+    Raises:
+        ValueError: If a video has no download link (the browser has to handle it)
+    """
+    file_idx = 0
+    seen_paths = set()
+    for resource in listing:
+        name = resource.get('name', '').translate(_NEWLINE_TO_SPACE).strip()
+        if not name:
+            continue
+        if resource.get('type') == 'dir':
+            if name in _IGNORED_FOLDERS or (test_mode and depth >= 1):
+                continue
+            # Clean folder name from date/time
+            cleaned_name = _DATE_SUFFIX_RE.sub('', name).strip()
+            if not cleaned_name or len(cleaned_name) < 2:
+                cleaned_name = name
+            child_path = f"{folder_path}/{cleaned_name}" if folder_path else cleaned_name
+            if child_path in seen_paths:
+                continue
+            seen_paths.add(child_path)
+            folder_info.append({
+                'name': cleaned_name,
+                'url': public_url.rstrip('/') + quote(resource['path']),
+                'path': child_path,
+            })
+            next_level.append((resource['path'], child_path, depth + 1))
+        elif name.lower().endswith(VIDEO_EXTENSIONS):
+            # No link when the owner disabled downloads: only the browser can get the stream
+            if not resource.get('file'):
+                raise ValueError(f"no download link for {name}")
+            items.append({
+                'name': name,
+                'download_url': resource['file'],
+                'order': file_idx,
+                'relative_path': f"{folder_path}/{name}" if folder_path else name,
+            })
+            file_idx += 1
+
+
 def parse_public_folder(public_url: str, base_path: str = "", verbose: bool = False, browser=None, context=None, page=None, playwright_instance=None, test_mode: bool = False, processed_folder_urls: set = None,
                         cache_dir: str = None, tree_file_path: str = None,
                         destination_path: str = None, oauth_token: str = None,
@@ -1549,6 +2038,9 @@ def parse_public_folder(public_url: str, base_path: str = "", verbose: bool = Fa
     2. Create folder tree
     3. Then, enter each folder one by one and collect files (or download immediately if download_immediately=True)
     
+    Library entry point: the command line below does not call it (it works
+    from tree.md via find_file_on_page / process_videos_sequentially instead).
+    
     Args:
         public_url: Public folder URL
         base_path: Base path for relative paths
@@ -1558,7 +2050,7 @@ def parse_public_folder(public_url: str, base_path: str = "", verbose: bool = Fa
         page: Playwright page instance (optional)
         playwright_instance: Playwright instance (optional)
         test_mode: If True, process only first video
-        processed_folder_urls: Set of already processed folder URLs
+        processed_folder_urls: Set of already processed folder URL keys (see _canon)
         cache_dir: Local cache directory for downloads (required if download_immediately=True)
         tree_file_path: Path to tree.md file (required if download_immediately=True)
         destination_path: Yandex Disk destination path (optional, for upload)
@@ -1566,13 +2058,22 @@ def parse_public_folder(public_url: str, base_path: str = "", verbose: bool = Fa
         download_immediately: If True, download and upload videos immediately instead of collecting in list
     
     Returns:
-        Tuple of (items, folder_info, browser, context, page, playwright_instance)
+        Tuple of (items, folder_info, browser, context, page, playwright_instance);
+        the browser objects are None when the listing came from the public API
     """
     if processed_folder_urls is None:
         processed_folder_urls = set()
     
     is_root_call = browser is None
     
+    # The public REST API returns whole listings without a browser; immediate
+    # downloads still need the page for cookies, so they keep the browser path
+    if is_root_call and not download_immediately:
+        api_result = _parse_public_folder_api(public_url, base_path, verbose, test_mode)
+        if api_result is not None:
+            items, folder_info = api_result
+            return items, folder_info, None, None, None, None
+    
     # Initialize browser if root call
     if is_root_call:
         if verbose:
@@ -1582,45 +2083,7 @@ def parse_public_folder(public_url: str, base_path: str = "", verbose: bool = Fa
         print("If captcha appears, solve it once - script will continue")
         print("in the same browser session to minimize bot detection.")
         print("="*60 + "\n")
-        playwright_instance = sync_playwright().start()
-        
-        try:
-            import shutil
-            chrome_paths = [
-                '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
-                '/Applications/Chromium.app/Contents/MacOS/Chromium',
-                shutil.which('google-chrome'),
-                shutil.which('chromium'),
-                shutil.which('chromium-browser'),
-            ]
-            chrome_executable = None
-            for path in chrome_paths:
-                if path and os.path.exists(path):
-                    chrome_executable = path
-                    if verbose:
-                        print(f"Using system browser: {path}")
-                    break
-            
-            browser = playwright_instance.chromium.launch(
-                headless=False,
-                executable_path=chrome_executable,
-                args=[
-                    '--enable-features=VaapiVideoDecoder',
-                    '--use-gl=egl',
-                    '--enable-hardware-acceleration',
-                ]
-            )
-        except Exception as e:
-            if verbose:
-                print(f"Could not use system Chrome, using Playwright Chromium: {e}")
-            browser = playwright_instance.chromium.launch(headless=False)
-        
-        context = browser.new_context(
-            user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            viewport={'width': 1920, 'height': 1080},
-            java_script_enabled=True,
-        )
-        page = context.new_page()
+        playwright_instance, browser, context, page = _BROWSER_POOL.new_page(verbose)
     
     items = []
     all_folders = []  # All folders found at all levels
@@ -1636,30 +2099,13 @@ def parse_public_folder(public_url: str, base_path: str = "", verbose: bool = Fa
                 print(f"Navigating to subfolder: {public_url}")
             page.goto(public_url, wait_until='domcontentloaded', timeout=60000)
         
-        page.wait_for_timeout(3000)
+        _wait_for_listing(page)
         
         # Check for captcha
         captcha_solved = False
         while not captcha_solved:
-            captcha_selectors = [
-                'text=/[Рр]обот|[Cc]aptcha|[Пп]одтвердите/',
-                '[class*="captcha"]',
-                '[class*="Captcha"]',
-                '[id*="captcha"]',
-                '[id*="Captcha"]',
-                'iframe[src*="captcha"]',
-                'iframe[src*="smartcaptcha"]'
-            ]
-            
-            captcha_found = False
-            for selector in captcha_selectors:
-                try:
-                    elements = page.query_selector_all(selector)
-                    if elements and len(elements) > 0:
-                        captcha_found = True
-                        break
-                except:
-                    continue
+            # One compound selector + page text check (see _is_captcha_present)
+            captcha_found = _is_captcha_present(page)
             
             if captcha_found:
                 if is_root_call:
@@ -1669,24 +2115,15 @@ def parse_public_folder(public_url: str, base_path: str = "", verbose: bool = Fa
                     print("After solving, press ENTER to continue...")
                     print("="*60 + "\n")
                     input("Press ENTER after solving captcha...")
-                page.wait_for_timeout(2000)
+                page.wait_for_load_state('domcontentloaded')
                 
-                captcha_still_present = False
-                for selector in captcha_selectors:
-                    try:
-                        elements = page.query_selector_all(selector)
-                        if elements and len(elements) > 0:
-                            captcha_still_present = True
-                            break
-                    except:
-                        continue
+                captcha_still_present = _is_captcha_present(page)
                 
                 if not captcha_still_present:
                     captcha_solved = True
                     if is_root_call:
                         print("Captcha solved! Continuing...\n")
-                    # Don't reload - just wait a bit for page to update
-                    page.wait_for_timeout(3000)
+                    # Don't reload - the content wait below picks up the listing
                 else:
                     if is_root_call:
                         print("Captcha still present. Please solve it and press ENTER again...")
@@ -1697,48 +2134,24 @@ def parse_public_folder(public_url: str, base_path: str = "", verbose: bool = Fa
         if verbose:
             print("  Waiting for page content to load...")
         
-        for attempt in range(10):
-            page.wait_for_timeout(2000)
-            test_elements = page.query_selector_all('a[href*="/d/"], [data-file-name], .listing-item, .resource-item')
-            if len(test_elements) > 0:
-                if verbose:
-                    print(f"  Content loaded (found {len(test_elements)} elements)")
-                break
+        # Returns as soon as the listing renders (same 20s worst case as before)
+        _wait_for_listing(page, timeout=20000)
+        if verbose:
+            print(f"  Content loaded (found {page.locator(_LISTING_READY_SELECTOR).count()} elements)")
         
         # STEP 1: Collect all folders from current level (without entering them)
         if verbose:
             print(f"  Step 1: Collecting folders from current level...")
+        # The folder itself counts as processed, so links back to it are not collected
+        processed_folder_urls.add(_canon(public_url))
         current_level_folders = collect_all_folders(page, public_url, base_path, verbose, processed_folder_urls)
         all_folders.extend(current_level_folders)
         if verbose:
             print(f"  Found {len(current_level_folders)} folder(s) at current level")
         
-        # STEP 2: Recursively collect folders from subfolders
+        # STEP 2: Collect folders from all subfolders (breadth-first, same page)
         if not test_mode:
-            for folder in current_level_folders:
-                try:
-                    # Recursively collect folders from subfolder (returns folders list, not items)
-                    subfolder_folders, _, _, _, _, _ = parse_public_folder(
-                        folder['url'],
-                        folder['path'],
-                        verbose,
-                        browser,
-                        context,
-                        page,
-                        playwright_instance,
-                        test_mode,
-                        processed_folder_urls,
-                        cache_dir=cache_dir,
-                        tree_file_path=tree_file_path,
-                        destination_path=destination_path,
-                        oauth_token=oauth_token,
-                        download_immediately=download_immediately
-                    )
-                    all_folders.extend(subfolder_folders)
-                except Exception as e:
-                    if verbose:
-                        print(f"  Warning: Could not collect folders from {folder['path']}: {e}")
-                    continue
+            all_folders.extend(_collect_subfolders(page, current_level_folders, verbose, processed_folder_urls))
         
         # For non-root calls, just return collected folders
         if not is_root_call:
@@ -1749,7 +2162,8 @@ def parse_public_folder(public_url: str, base_path: str = "", verbose: bool = Fa
             print(f"  Step 3: Entering folders to collect files...")
             print(f"  Total folders to process: {len(all_folders)}")
         
-        # Process all collected folders
+        # Process all collected folders on this page, one by one, so a captcha
+        # only ever has to be solved in this one browser window
         for folder in all_folders:
             # Enter folder and collect files (or download immediately)
             folder_items = parse_folder_contents(page, folder['url'], folder['path'], verbose,
@@ -1771,10 +2185,9 @@ def parse_public_folder(public_url: str, base_path: str = "", verbose: bool = Fa
         if verbose:
             print(f"  Collected {len(root_items)} video(s) from root level")
         
-        # Convert all_folders to folder_info format
-        folder_info = [{'name': f['name'], 'path': f['path']} for f in all_folders]
-        
-        return items, folder_info, browser, context, page, playwright_instance
+        # The collected folder dicts already carry 'name' and 'path' (plus 'url',
+        # which folder_info consumers ignore), so they are returned as they are
+        return items, all_folders, browser, context, page, playwright_instance
         
     except Exception as e:
         if is_root_call:
@@ -1783,6 +2196,23 @@ def parse_public_folder(public_url: str, base_path: str = "", verbose: bool = Fa
             return [], [], None, None, None, None
 
 
+def _local_file_size(path: str) -> int:
+    """
+    Size of a local file with a single stat call.
+    
+    Args:
+        path: Local file path
+    
+    Returns:
+        File size in bytes, or 0 if the file doesn't exist
+    """
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return 0
+
+
+@functools.lru_cache(maxsize=8192)
 def sanitize_filename(filename: str) -> str:
     """
     Sanitize filename for filesystem compatibility while preserving Unicode.
@@ -1793,22 +2223,36 @@ def sanitize_filename(filename: str) -> str:
     Returns:
         Sanitized filename safe for filesystem
     """
-    # Remove or replace invalid filesystem characters
+    # Replace invalid filesystem characters in one pass
     # But preserve Unicode characters (Cyrillic, etc.)
-    invalid_chars = '<>:"|?*\\'
-    sanitized = filename
-    for char in invalid_chars:
-        sanitized = sanitized.replace(char, '_')
+    sanitized = filename.translate(_SANITIZE_TABLE)
     
     # Remove leading/trailing dots and spaces (Windows issue)
     sanitized = sanitized.strip('. ')
     
     # Replace multiple underscores with single one
-    sanitized = re.sub(r'_+', '_', sanitized)
+    sanitized = _UNDERSCORE_RUN_RE.sub('_', sanitized)
     
     return sanitized.strip('_')
 
 
+@functools.lru_cache(maxsize=4096)
+def _clean_folder_part(part: str) -> str:
+    """
+    Strip a trailing date (and whatever follows it) from a folder name.
+    
+    Args:
+        part: Folder name (one path component)
+    
+    Returns:
+        Cleaned name, or the original name if less than 2 characters would remain
+    """
+    cleaned_part = _DATE_SUFFIX_RE.sub('', part).strip()
+    if len(cleaned_part) < 2:
+        return part
+    return cleaned_part
+
+
 def sanitize_folder_name(folder_name: str) -> str:
     """
     Sanitize folder name for filesystem compatibility while preserving Unicode.
@@ -1819,37 +2263,24 @@ def sanitize_folder_name(folder_name: str) -> str:
     Returns:
         Sanitized folder name safe for filesystem
     """
-    import re
     # Same as filename sanitization
-    invalid_chars = '<>:"|?*\\'
-    sanitized = folder_name
-    for char in invalid_chars:
-        sanitized = sanitized.replace(char, '_')
-    
-    sanitized = sanitized.strip('. ')
-    sanitized = re.sub(r'_+', '_', sanitized)
-    
-    return sanitized.strip('_')
+    return sanitize_filename(folder_name)
 
 
-def create_folder_structure(destination_path: str, folder_path: str, oauth_token: str, verbose: bool = False) -> None:
+def _remote_folder_paths(destination_path: str, folder_path: str) -> List[str]:
     """
-    Create folder structure on Yandex Disk.
+    List the Yandex Disk paths of folder_path and all its parents.
     
     Args:
         destination_path: Base destination path on Yandex Disk
-        folder_path: Relative folder path to create
-        oauth_token: OAuth token for Yandex Disk API
-        verbose: Enable verbose output
-    """
-    if not folder_path:
-        return
+        folder_path: Relative folder path
     
-    # Split folder path into parts
-    path_parts = folder_path.split('/')
+    Returns:
+        Full paths, parents first
+    """
+    paths = []
     current_path = destination_path
-    
-    for part in path_parts:
+    for part in folder_path.split('/'):
         if not part:
             continue
         
@@ -1860,32 +2291,128 @@ def create_folder_structure(destination_path: str, folder_path: str, oauth_token
         
         # Build full path
         if current_path.endswith('/'):
-            full_path = f"{current_path}{sanitized_part}"
+            current_path = f"{current_path}{sanitized_part}"
         else:
-            full_path = f"{current_path}/{sanitized_part}"
+            current_path = f"{current_path}/{sanitized_part}"
+        paths.append(current_path)
+    return paths
+
+
+def _create_remote_folder(full_path: str, oauth_token: str, verbose: bool = False) -> None:
+    """
+    Create one folder on Yandex Disk (its parent must exist).
+    
+    Args:
+        full_path: Full folder path on Yandex Disk
+        oauth_token: OAuth token for Yandex Disk API
+        verbose: Enable verbose output
+    """
+    try:
+        api_url = "https://cloud-api.yandex.net/v1/disk/resources"
+        headers = {'Authorization': f'OAuth {oauth_token}'}
+        params = {'path': full_path}
         
-        # Create folder via API
-        try:
-            api_url = "https://cloud-api.yandex.net/v1/disk/resources"
-            headers = {'Authorization': f'OAuth {oauth_token}'}
-            params = {'path': full_path}
-            
-            response = requests.put(f"{api_url}?path={full_path}", headers=headers, timeout=30)
-            
-            # 201 = created, 409 = already exists (both are OK)
-            if response.status_code not in [201, 409]:
-                if verbose:
-                    print(f"  Warning: Could not create folder {full_path}: {response.status_code}")
-            elif verbose:
-                print(f"  Created folder: {full_path}")
-        except Exception as e:
-            if verbose:
-                print(f"  Warning: Error creating folder {full_path}: {e}")
+        response = _SESSION.put(api_url, headers=headers, params=params, timeout=30)
         
-        current_path = full_path
+        # 201 = created, 409 = already exists (both are OK)
+        if response.status_code not in [201, 409]:
+            if verbose:
+                print(f"  Warning: Could not create folder {full_path}: {response.status_code}")
+            return
+        with _REMOTE_FOLDERS_LOCK:
+            _REMOTE_FOLDERS.add(full_path)
+        if verbose:
+            print(f"  Created folder: {full_path}")
+    except Exception as e:
+        if verbose:
+            print(f"  Warning: Error creating folder {full_path}: {e}")
+
+
+def create_folder_structure_batch(destination_path: str, folder_paths, oauth_token: str, verbose: bool = False) -> None:
+    """
+    Create several folder structures on Yandex Disk.
+    
+    Every distinct folder is created once per process. Folders of the same
+    depth are independent, so each depth level is created concurrently before
+    moving on to the next one.
+    
+    Args:
+        destination_path: Base destination path on Yandex Disk
+        folder_paths: Relative folder paths to create
+        oauth_token: OAuth token for Yandex Disk API
+        verbose: Enable verbose output
+    """
+    levels = {}
+    for folder_path in folder_paths:
+        if not folder_path:
+            continue
+        for depth, full_path in enumerate(_remote_folder_paths(destination_path, folder_path)):
+            levels.setdefault(depth, set()).add(full_path)
+    
+    for depth in sorted(levels):
+        with _REMOTE_FOLDERS_LOCK:
+            pending = sorted(levels[depth] - _REMOTE_FOLDERS)
+        if not pending:
+            continue
+        if len(pending) == 1:
+            _create_remote_folder(pending[0], oauth_token, verbose)
+            continue
+        with ThreadPoolExecutor(max_workers=min(16, len(pending))) as executor:
+            list(executor.map(lambda full_path: _create_remote_folder(full_path, oauth_token, verbose), pending))
+
+
+def create_folder_structure(destination_path: str, folder_path: str, oauth_token: str, verbose: bool = False) -> None:
+    """
+    Create folder structure on Yandex Disk.
+    
+    Args:
+        destination_path: Base destination path on Yandex Disk
+        folder_path: Relative folder path to create
+        oauth_token: OAuth token for Yandex Disk API
+        verbose: Enable verbose output
+    """
+    create_folder_structure_batch(destination_path, (folder_path,), oauth_token, verbose)
+
+
+def _preallocate(f, response) -> None:
+    """
+    Reserve disk space for a download of known size in one allocation.
+    
+    The caller must truncate the file at its final write position, so an
+    interrupted download doesn't look complete.
+    
+    Args:
+        f: File opened for binary writing
+        response: requests response opened with stream=True
+    """
+    if not hasattr(os, 'posix_fallocate'):
+        return
+    # Content-Length of an encoded body is not the size written to disk
+    if response.headers.get('content-encoding', 'identity').lower() != 'identity':
+        return
+    total_size = int(response.headers.get('content-length', 0) or 0)
+    if total_size > 0:
+        try:
+            os.posix_fallocate(f.fileno(), 0, total_size)
+        except OSError:
+            pass
+
+
+def _copy_response(response, f) -> None:
+    """
+    Write a streamed response body to an open file in large blocks.
+    
+    Args:
+        response: requests response opened with stream=True
+        f: File opened for binary writing
+    """
+    import shutil
+    # Let urllib3 undo gzip/deflate like iter_content() would
+    response.raw.decode_content = True
+    shutil.copyfileobj(response.raw, f, _DOWNLOAD_CHUNK_SIZE)
 
 
-def download_video(download_url: str, local_path: str, verbose: bool = False, page=None) -> bool:
+def download_video(download_url: str, local_path: str, verbose: bool = False, page=None, cookies: Optional[Dict] = None) -> bool:
     """
     Download video file from URL to local path.
     
@@ -1893,6 +2420,8 @@ def download_video(download_url: str, local_path: str, verbose: bool = False, pa
         download_url: URL to download video from
         local_path: Local file path to save video to
         verbose: Enable verbose output
+        page: Playwright page to take cookies from (main thread only)
+        cookies: Pre-collected browser cookies; used instead of page from worker threads
     
     Returns:
         True if download successful, False otherwise
@@ -1911,20 +2440,22 @@ def download_video(download_url: str, local_path: str, verbose: bool = False, pa
         os.makedirs(os.path.dirname(local_path), exist_ok=True)
         
         # Check if URL is a Yandex Disk page (needs yt-dlp) or direct download
-        is_direct_download = any(download_url.lower().endswith(ext) for ext in VIDEO_EXTENSIONS + ['.m3u8', '.mpd'])
+        is_direct_download = download_url.lower().endswith(_DIRECT_DOWNLOAD_EXTENSIONS)
         is_yandex_page = ('disk.yandex.ru/d/' in download_url or 'yadi.sk/d/' in download_url) and not is_direct_download
         
         # If we have a Playwright page and it's a direct download, use cookies from browser
-        if page and is_direct_download:
+        if (page or cookies is not None) and is_direct_download:
             try:
                 if verbose:
                     print(f"  Using browser cookies for download...")
                 
-                cookies = page.context.cookies()
-                cookie_dict = {cookie['name']: cookie['value'] for cookie in cookies}
+                if cookies is not None:
+                    cookie_dict = cookies
+                else:
+                    cookie_dict = _get_cookie_dict(page)
                 
-                with requests.get(download_url, stream=True, timeout=300, 
-                                headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'},
+                with _SESSION.get(download_url, stream=True, timeout=300, 
+                                headers={'User-Agent': _DOWNLOAD_USER_AGENT},
                                 cookies=cookie_dict) as r:
                     r.raise_for_status()
                     content_type = r.headers.get('content-type', '').lower()
@@ -1934,16 +2465,28 @@ def download_video(download_url: str, local_path: str, verbose: bool = False, pa
                         raise Exception(f"URL returned HTML instead of video (likely captcha page)")
                     
                     with open(local_path, 'wb') as f:
-                        downloaded = 0
-                        for chunk in r.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
-                                downloaded += len(chunk)
-                                if verbose and total_size > 0:
-                                    percent = (downloaded / total_size) * 100
-                                    print(f'\r  Downloading: {percent:.1f}% ({downloaded}/{total_size} bytes)', end='', flush=True)
-                        if verbose:
-                            print()  # New line
+                        _preallocate(f, r)
+                        try:
+                            if verbose and total_size > 0:
+                                downloaded = 0
+                                last_report = 0.0
+                                for chunk in r.iter_content(chunk_size=_DOWNLOAD_CHUNK_SIZE):
+                                    if chunk:
+                                        f.write(chunk)
+                                        downloaded += len(chunk)
+                                        now = time.monotonic()
+                                        if now - last_report >= _PROGRESS_INTERVAL or downloaded >= total_size:
+                                            last_report = now
+                                            percent = (downloaded / total_size) * 100
+                                            print(f'\r  Downloading: {percent:.1f}% ({downloaded}/{total_size} bytes)', end='', flush=True)
+                                print()  # New line
+                            else:
+                                # No progress to show: copy the socket straight into the file
+                                _copy_response(r, f)
+                        finally:
+                            # Drop preallocated space that was never written (e.g. broken connection)
+                            f.truncate()
+                        downloaded = f.tell()
                     
                     if verbose:
                         print(f"  Download completed: {downloaded} bytes")
@@ -1966,7 +2509,7 @@ def download_video(download_url: str, local_path: str, verbose: bool = False, pa
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 ydl.download([download_url])
             
-            if os.path.exists(local_path) and os.path.getsize(local_path) > 0:
+            if _local_file_size(local_path) > 0:
                 if verbose:
                     print(f"  Download completed")
                 return True
@@ -1977,7 +2520,7 @@ def download_video(download_url: str, local_path: str, verbose: bool = False, pa
             if verbose:
                 print(f"  Downloading directly...")
             
-            with requests.get(download_url, stream=True, timeout=300) as r:
+            with _SESSION.get(download_url, stream=True, timeout=300) as r:
                 r.raise_for_status()
                 content_type = r.headers.get('content-type', '').lower()
                 
@@ -1985,9 +2528,11 @@ def download_video(download_url: str, local_path: str, verbose: bool = False, pa
                     raise Exception(f"URL returned HTML instead of video")
                 
                 with open(local_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
+                    _preallocate(f, r)
+                    try:
+                        _copy_response(r, f)
+                    finally:
+                        f.truncate()
             
             if verbose:
                 print(f"  Download completed")
@@ -2019,7 +2564,7 @@ def get_upload_url(destination_path: str, oauth_token: str, verbose: bool = Fals
     params = {'path': destination_path, 'overwrite': 'true'}
     
     try:
-        response = requests.get(api_url, headers=headers, params=params, timeout=30)
+        response = _SESSION.get(api_url, headers=headers, params=params, timeout=30)
         response.raise_for_status()
         upload_data = response.json()
         upload_url = upload_data.get('href')
@@ -2039,7 +2584,7 @@ def get_folder_url_from_path(destination_path: str, oauth_token: str, verbose: b
     
     Args:
         destination_path: Full path to folder on Yandex Disk (e.g., "/Videos/Downloaded")
-        oauth_token: OAuth token for Yandex Disk API
+        oauth_token: OAuth token for Yandex Disk API (unused, kept for callers)
         verbose: Enable verbose output
     
     Returns:
@@ -2050,36 +2595,15 @@ def get_folder_url_from_path(destination_path: str, oauth_token: str, verbose: b
         path_parts = [p for p in destination_path.split('/') if p]
         
         # Remove filename if it's in the path (check if last part looks like a file)
-        if path_parts and any(path_parts[-1].endswith(ext) for ext in VIDEO_EXTENSIONS + ['.txt', '.zip', '.rar']):
+        if path_parts and path_parts[-1].endswith(_FILE_LIKE_EXTENSIONS):
             path_parts = path_parts[:-1]
         
         if not path_parts:
             # Root folder
             return "https://disk.yandex.ru"
         
-        # Build folder path
-        folder_path = '/' + '/'.join(path_parts)
-        
-        # Try to get folder info from API to construct proper URL
-        api_url = "https://cloud-api.yandex.net/v1/disk/resources"
-        headers = {'Authorization': f'OAuth {oauth_token}'}
-        params = {'path': folder_path}
-        
-        try:
-            response = requests.get(api_url, headers=headers, params=params, timeout=30)
-            if response.status_code == 200:
-                # Folder exists, construct URL
-                # Format: https://disk.yandex.ru/client/disk/Папка1/Папка2
-                # URL-encode folder names
-                encoded_parts = [quote(part, safe='') for part in path_parts]
-                folder_url = "https://disk.yandex.ru/client/disk/" + "/".join(encoded_parts)
-                if verbose:
-                    print(f"  Constructed folder URL: {folder_url}")
-                return folder_url
-        except:
-            pass
-        
-        # Fallback: construct URL directly from path parts
+        # Format: https://disk.yandex.ru/client/disk/Папка1/Папка2
+        # The URL depends only on the path, so no API lookup is needed
         encoded_parts = [quote(part, safe='') for part in path_parts]
         folder_url = "https://disk.yandex.ru/client/disk/" + "/".join(encoded_parts)
         if verbose:
@@ -2092,6 +2616,23 @@ def get_folder_url_from_path(destination_path: str, oauth_token: str, verbose: b
         return None
 
 
+def _any_locator(page, selectors):
+    """
+    Combine selectors into one locator matching any of them.
+    
+    Args:
+        page: Playwright page instance
+        selectors: Playwright selectors (CSS or text=)
+    
+    Returns:
+        Locator for the union of all selectors
+    """
+    locator = page.locator(selectors[0])
+    for selector in selectors[1:]:
+        locator = locator.or_(page.locator(selector))
+    return locator
+
+
 def upload_to_yandex_disk_web_interface(local_path: str, destination_path: str, page, oauth_token: str = None, verbose: bool = False) -> bool:
     """
     Upload file to Yandex Disk through web interface using Playwright (faster than API).
@@ -2113,17 +2654,8 @@ def upload_to_yandex_disk_web_interface(local_path: str, destination_path: str,
         # Get folder URL from destination path
         folder_url = None
         if destination_path and destination_path != '/':
-            if oauth_token:
-                folder_url = get_folder_url_from_path(destination_path, oauth_token, verbose)
-            else:
-                # Fallback: construct URL directly from path
-                path_parts = [p for p in destination_path.split('/') if p]
-                # Remove filename if present
-                if path_parts and any(path_parts[-1].endswith(ext) for ext in VIDEO_EXTENSIONS + ['.txt', '.zip', '.rar']):
-                    path_parts = path_parts[:-1]
-                if path_parts:
-                    encoded_parts = [quote(part, safe='') for part in path_parts]
-                    folder_url = "https://disk.yandex.ru/client/disk/" + "/".join(encoded_parts)
+            # Built from the path alone, so no token is needed
+            folder_url = get_folder_url_from_path(destination_path, oauth_token, verbose)
         
         # Navigate to Yandex Disk or specific folder
         if folder_url:
@@ -2151,9 +2683,6 @@ def upload_to_yandex_disk_web_interface(local_path: str, destination_path: str,
         if verbose:
             print(f"  Looking for upload input...")
         
-        # Wait for page to be ready
-        page.wait_for_timeout(1000)
-        
         # Try to find file input (usually hidden)
         # Yandex Disk uses a file input for uploads
         file_input_selector = 'input[type="file"]'
@@ -2196,66 +2725,29 @@ def upload_to_yandex_disk_web_interface(local_path: str, destination_path: str,
         if verbose:
             print(f"  Waiting for upload to complete...")
         
-        # Monitor upload progress
-        # Look for progress indicators or completion messages
+        # Wait for a completion or error indicator; Playwright reacts to the DOM
+        # change itself instead of us re-checking every indicator every 2s
         max_wait_time = 3600  # 1 hour max
-        start_time = page.evaluate("() => Date.now()")
+        completed = _any_locator(page, _UPLOAD_DONE_SELECTORS)
+        failed = _any_locator(page, _UPLOAD_ERROR_SELECTORS)
+        try:
+            completed.or_(failed).first.wait_for(state='visible', timeout=max_wait_time * 1000)
+        except PlaywrightTimeoutError:
+            if verbose:
+                print(f"  Upload timeout after {max_wait_time} seconds")
+            return False
         
-        while True:
-            page.wait_for_timeout(2000)
-            
-            # Check for completion indicators
-            completion_indicators = [
-                'text=/загрузка завершена/i',
-                'text=/upload complete/i',
-                'text=/файл загружен/i',
-                '.upload-complete',
-                '[data-testid="upload-complete"]'
-            ]
-            
-            for indicator in completion_indicators:
-                try:
-                    element = page.locator(indicator).first
-                    if element.is_visible(timeout=100):
-                        if verbose:
-                            print(f"  Upload completed!")
-                        return True
-                except:
-                    continue
-            
-            # Check for errors
-            error_indicators = [
-                'text=/ошибка/i',
-                'text=/error/i',
-                '.upload-error',
-                '[data-testid="upload-error"]'
-            ]
-            
-            for indicator in error_indicators:
-                try:
-                    element = page.locator(indicator).first
-                    if element.is_visible(timeout=100):
-                        error_text = element.text_content()
-                        if verbose:
-                            print(f"  Upload error: {error_text}")
-                        return False
-                except:
-                    continue
-            
-            # Check timeout
-            current_time = page.evaluate("() => Date.now()")
-            if (current_time - start_time) > max_wait_time * 1000:
-                if verbose:
-                    print(f"  Upload timeout after {max_wait_time} seconds")
-                return False
-            
-            # Show progress (if available)
+        if completed.first.is_visible():
+            if verbose:
+                print(f"  Upload completed!")
+            return True
+        
+        if verbose:
             try:
-                progress_text = page.locator('.upload-progress, [data-testid="upload-progress"]').first.text_content()
-                if progress_text and verbose:
-                    print(f'\r\033[K  {progress_text}', end='', flush=True)
+                print(f"  Upload error: {failed.first.text_content()}")
             except:
-                pass
+                print(f"  Upload error")
+        return False
         
     except Exception as e:
         if verbose:
@@ -2263,6 +2755,15 @@ def upload_to_yandex_disk_web_interface(local_path: str, destination_path: str,
         return False
 
 
+def _format_bytes(bytes_val: float) -> str:
+    """Format a byte count for progress output (e.g. "12.3 MB")."""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if bytes_val < 1024.0:
+            return f"{bytes_val:.1f} {unit}"
+        bytes_val /= 1024.0
+    return f"{bytes_val:.1f} TB"
+
+
 def upload_to_yandex_disk_api_only(local_path: str, destination_path: str, oauth_token: str, verbose: bool = False) -> bool:
     """
     Upload file to Yandex Disk via API only (standard method, no optimizations).
@@ -2291,13 +2792,21 @@ def upload_to_yandex_disk_api_only(local_path: str, destination_path: str, oauth
                 self.total_size = total_size
                 self.uploaded = 0
                 self.callback = callback
+                self.last_time = 0.0
+            
+            def __len__(self):
+                # Lets requests send Content-Length instead of chunked encoding
+                return self.total_size
             
             def read(self, size=-1):
-                chunk = self.file_obj.read(size)
+                chunk = self.file_obj.read(max(size, _UPLOAD_CHUNK_SIZE) if size > 0 else size)
                 if chunk:
                     self.uploaded += len(chunk)
                     if self.callback:
-                        self.callback(self.uploaded, self.total_size)
+                        now = time.monotonic()
+                        if now - self.last_time >= _PROGRESS_INTERVAL or self.uploaded >= self.total_size:
+                            self.last_time = now
+                            self.callback(self.uploaded, self.total_size)
                 return chunk
             
             def __enter__(self):
@@ -2306,21 +2815,15 @@ def upload_to_yandex_disk_api_only(local_path: str, destination_path: str, oauth
             def __exit__(self, *args):
                 pass
         
-        # Progress callback function
+        # Progress callback function (the total never changes, so format it once)
+        total_str = _format_bytes(file_size)
+        
         def show_progress(uploaded, total):
             percent = (uploaded / total) * 100 if total > 0 else 0
             bar_length = 40
             filled = int(bar_length * uploaded / total) if total > 0 else 0
             bar = '=' * filled + '-' * (bar_length - filled)
-            def format_bytes(bytes_val):
-                for unit in ['B', 'KB', 'MB', 'GB']:
-                    if bytes_val < 1024.0:
-                        return f"{bytes_val:.1f} {unit}"
-                    bytes_val /= 1024.0
-                return f"{bytes_val:.1f} TB"
-            
-            uploaded_str = format_bytes(uploaded)
-            total_str = format_bytes(total)
+            uploaded_str = _format_bytes(uploaded)
             # Use ANSI escape code to clear line and move cursor to beginning
             # \033[K clears from cursor to end of line, \r moves to beginning
             message = f'  Uploading: [{bar}] {percent:.1f}% ({uploaded_str}/{total_str})'
@@ -2330,7 +2833,7 @@ def upload_to_yandex_disk_api_only(local_path: str, destination_path: str, oauth
         headers = {'Content-Type': 'application/octet-stream'}
         with open(local_path, 'rb') as f:
             progress_file = ProgressFile(f, file_size, show_progress)
-            response = requests.put(upload_url, data=progress_file, headers=headers, timeout=600)
+            response = _SESSION.put(upload_url, data=progress_file, headers=headers, timeout=600)
             response.raise_for_status()
         
         print()  # New line after progress bar
@@ -2350,7 +2853,7 @@ def upload_to_yandex_disk_api_only(local_path: str, destination_path: str, oauth
 def upload_to_yandex_disk_with_extension_workaround(local_path: str, destination_path: str, oauth_token: str, verbose: bool = False) -> bool:
     """
     Upload file to Yandex Disk with extension workaround to bypass 128 KB/s limit.
-    Temporarily changes file extension to .txt, uploads, then renames back.
+    Uploads under a .txt name, then renames back on Yandex Disk.
     
     Args:
         local_path: Local file path to upload
@@ -2361,72 +2864,196 @@ def upload_to_yandex_disk_with_extension_workaround(local_path: str, destination
     Returns:
         True if upload successful, False otherwise
     """
-    import tempfile
-    import shutil
-    
     try:
-        # Get original file extension
-        original_ext = os.path.splitext(local_path)[1]
-        original_name = os.path.basename(local_path)
+        # Only the remote name matters to Yandex Disk, so the local file is
+        # uploaded as is; no .txt copy is made on disk
+        destination_path_txt = os.path.splitext(destination_path)[0] + '.txt'
+        
+        # Upload with .txt extension using API directly (no recursion)
+        if verbose:
+            print(f"  Uploading as .txt file (bypassing speed limit)...")
+        success = upload_to_yandex_disk_api_only(local_path, destination_path_txt, oauth_token, verbose)
         
-        # Create temporary file with .txt extension
-        temp_dir = tempfile.gettempdir()
-        temp_name = os.path.splitext(original_name)[0] + '.txt'
-        temp_path = os.path.join(temp_dir, temp_name)
+        if not success:
+            return False
         
+        # Rename file back to original extension via API
         if verbose:
-            print(f"  Creating temporary file with .txt extension to bypass speed limit...")
+            print(f"  Renaming file back to original extension...")
         
-        # Copy file to temp location with .txt extension
-        shutil.copy2(local_path, temp_path)
+        api_url = "https://cloud-api.yandex.net/v1/disk/resources/move"
+        headers = {'Authorization': f'OAuth {oauth_token}'}
+        params = {
+            'from': destination_path_txt,
+            'path': destination_path,
+            'overwrite': 'true'
+        }
         
-        # Change destination path extension to .txt
-        destination_path_txt = os.path.splitext(destination_path)[0] + '.txt'
+        response = _SESSION.post(api_url, headers=headers, params=params, timeout=30)
+        response.raise_for_status()
         
-        try:
-            # Upload with .txt extension using API directly (no recursion)
-            if verbose:
-                print(f"  Uploading as .txt file (bypassing speed limit)...")
-            success = upload_to_yandex_disk_api_only(temp_path, destination_path_txt, oauth_token, verbose)
+        if verbose:
+            print(f"  File renamed successfully")
+        
+        return True
+                
+    except Exception as e:
+        if verbose:
+            print(f"  Extension workaround upload failed: {e}")
+        return False
+
+
+class _StreamBody:
+    """File-like PUT body reading straight from a streamed download of known length."""
+    
+    def __init__(self, raw, length: int):
+        self.raw = raw
+        self.length = length
+    
+    def __len__(self):
+        # Lets requests send Content-Length instead of chunked encoding
+        return self.length
+    
+    def read(self, size=-1):
+        return self.raw.read(max(size, _DOWNLOAD_CHUNK_SIZE) if size > 0 else size)
+
+
+def upload_stream_to_yandex_disk(download_url: str, destination_path: str, oauth_token: str,
+                                 cookies: Optional[Dict] = None, verbose: bool = False) -> bool:
+    """
+    Pipe a direct video download into a Yandex Disk upload without a local copy.
+    
+    Restricted extensions use the same .txt upload + rename as
+    upload_to_yandex_disk_with_extension_workaround.
+    
+    Args:
+        download_url: Direct video URL
+        destination_path: Destination path on Yandex Disk
+        oauth_token: OAuth token for Yandex Disk API
+        cookies: Browser cookies for the download request
+        verbose: Enable verbose output
+    
+    Returns:
+        True if upload successful, False otherwise
+    """
+    try:
+        use_workaround = os.path.splitext(destination_path)[1].lower() in _RESTRICTED_UPLOAD_EXTENSIONS
+        upload_path = os.path.splitext(destination_path)[0] + '.txt' if use_workaround else destination_path
+        # Ask for the upload URL while the download request is being answered
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            upload_url_future = executor.submit(get_upload_url, upload_path, oauth_token, verbose)
+            r = _SESSION.get(download_url, stream=True, timeout=300,
+                             headers={'User-Agent': _DOWNLOAD_USER_AGENT}, cookies=cookies)
+            try:
+                upload_url = upload_url_future.result()
+            except Exception:
+                r.close()
+                raise
+        
+        with r:
+            r.raise_for_status()
+            if 'text/html' in r.headers.get('content-type', '').lower():
+                raise Exception("URL returned HTML instead of video (likely captcha page)")
             
-            if not success:
-                return False
+            total_size = int(r.headers.get('content-length', 0))
+            encoding = r.headers.get('content-encoding', 'identity').lower()
+            if total_size > 0 and encoding == 'identity':
+                body = _StreamBody(r.raw, total_size)
+            else:
+                # Unknown length: requests falls back to chunked transfer encoding
+                body = r.iter_content(chunk_size=_DOWNLOAD_CHUNK_SIZE)
             
-            # Rename file back to original extension via API
             if verbose:
-                print(f"  Renaming file back to original extension...")
-            
-            api_url = "https://cloud-api.yandex.net/v1/disk/resources/move"
-            headers = {'Authorization': f'OAuth {oauth_token}'}
-            params = {
-                'from': destination_path_txt,
-                'path': destination_path,
-                'overwrite': 'true'
-            }
-            
-            response = requests.post(api_url, headers=headers, params=params, timeout=30)
+                print(f"  Streaming download into upload ({total_size or 'unknown'} bytes)...")
+            response = _SESSION.put(upload_url, data=body,
+                                    headers={'Content-Type': 'application/octet-stream'}, timeout=600)
             response.raise_for_status()
-            
-            if verbose:
-                print(f"  File renamed successfully")
-            
-            return True
-            
-        finally:
-            # Clean up temp file
-            try:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except:
-                pass
-                
+        
+        if use_workaround:
+            response = _SESSION.post("https://cloud-api.yandex.net/v1/disk/resources/move",
+                                     headers={'Authorization': f'OAuth {oauth_token}'},
+                                     params={'from': upload_path, 'path': destination_path, 'overwrite': 'true'},
+                                     timeout=30)
+            response.raise_for_status()
+        
+        if verbose:
+            print(f"  Streamed upload completed")
+        return True
     except Exception as e:
         if verbose:
-            print(f"  Extension workaround upload failed: {e}")
+            print(f"  Streamed upload failed: {e}")
+        return False
+
+
+def _disk_file_info(path: str, oauth_token: str) -> Optional[Dict]:
+    """
+    Look up a file on Yandex Disk.
+    
+    Args:
+        path: Full file path on Yandex Disk
+        oauth_token: OAuth token for Yandex Disk API
+    
+    Returns:
+        Dict with 'name', 'size' and 'md5', or None if there is no such file
+    """
+    try:
+        response = _SESSION.get("https://cloud-api.yandex.net/v1/disk/resources",
+                                headers={'Authorization': f'OAuth {oauth_token}'},
+                                params={'path': path, 'fields': 'name,size,md5,type'}, timeout=30)
+        if response.status_code != 200:
+            return None
+        info = response.json()
+        return info if info.get('type') == 'file' else None
+    except Exception:
+        return None
+
+
+def _same_file_on_disk(local_path: str, info: Optional[Dict]) -> bool:
+    """
+    Check whether a Yandex Disk file (see _disk_file_info) has the local file's content.
+    
+    Sizes are compared first; the local MD5 is only computed when they match.
+    
+    Args:
+        local_path: Local file path
+        info: Remote file info, or None
+    
+    Returns:
+        True if size and MD5 match, False otherwise (also if the local file is missing)
+    """
+    if not info or info.get('size') != _local_file_size(local_path) or not info.get('md5'):
+        return False
+    digest = hashlib.md5()
+    try:
+        with open(local_path, 'rb') as f:
+            for block in iter(lambda: f.read(_DOWNLOAD_CHUNK_SIZE), b''):
+                digest.update(block)
+    except OSError:
         return False
+    return digest.hexdigest() == info['md5']
+
+
+def disk_files_exist_batch(paths, oauth_token: str) -> Dict[str, Optional[Dict]]:
+    """
+    Look up several files on Yandex Disk concurrently.
+    
+    Args:
+        paths: Full file paths on Yandex Disk
+        oauth_token: OAuth token for Yandex Disk API
+    
+    Returns:
+        Dict mapping each path to its file info (see _disk_file_info) or None
+    """
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(16, len(paths))) as executor:
+        infos = executor.map(lambda path: _disk_file_info(path, oauth_token), paths)
+        return dict(zip(paths, infos))
 
 
-def upload_to_yandex_disk(local_path: str, destination_path: str, oauth_token: str, verbose: bool = False, use_web_interface: bool = False, page = None) -> bool:
+def upload_to_yandex_disk(local_path: str, destination_path: str, oauth_token: str, verbose: bool = False, use_web_interface: bool = False, page = None,
+                          check_existing: bool = True) -> bool:
     """
     Upload file to Yandex Disk with progress bar.
     Supports multiple upload methods for optimal speed.
@@ -2438,6 +3065,8 @@ def upload_to_yandex_disk(local_path: str, destination_path: str, oauth_token: s
         verbose: Enable verbose output
         use_web_interface: If True, use web interface upload (faster, requires Playwright page)
         page: Playwright page object (required if use_web_interface=True)
+        check_existing: Skip the upload if Yandex Disk already has the same file
+                        (pass False when the caller has already checked)
     
     Returns:
         True if upload successful, False otherwise
@@ -2446,6 +3075,12 @@ def upload_to_yandex_disk(local_path: str, destination_path: str, oauth_token: s
         requests.RequestException: On API or network error
         IOError: On file read error
     """
+    # Same file already on Yandex Disk (e.g. uploaded before a crash): nothing to send
+    if check_existing and _same_file_on_disk(local_path, _disk_file_info(destination_path, oauth_token)):
+        if verbose:
+            print(f"  {destination_path} already exists on Yandex Disk with the same content, skipping upload")
+        return True
+    
     # Try web interface first if requested
     if use_web_interface and page:
         if verbose:
@@ -2462,9 +3097,8 @@ def upload_to_yandex_disk(local_path: str, destination_path: str, oauth_token: s
     
     # Try extension workaround for API upload (bypasses 128 KB/s limit)
     file_ext = os.path.splitext(local_path)[1].lower()
-    restricted_extensions = ['.mp4', '.avi', '.mkv', '.mov', '.webm', '.flv', '.wmv', '.m4v', '.3gp', '.ogv', '.zip', '.rar', '.7z', '.tar', '.gz', '.db', '.sqlite', '.sqlite3']
     
-    if file_ext in restricted_extensions:
+    if file_ext in _RESTRICTED_UPLOAD_EXTENSIONS:
         if verbose:
             print(f"  File extension {file_ext} is restricted, using extension workaround...")
         try:
@@ -2477,6 +3111,134 @@ def upload_to_yandex_disk(local_path: str, destination_path: str, oauth_token: s
     return upload_to_yandex_disk_api_only(local_path, destination_path, oauth_token, verbose)
 
 
+def _add_tree_entry(entries: Dict[Tuple[str, ...], Optional[str]], path: str, status: Optional[str] = None) -> None:
+    """
+    Add a folder (status None) or file entry plus its missing parent folders.
+    
+    Args:
+        entries: Mapping of path parts -> file status suffix (None for folders)
+        path: Slash-separated relative path
+        status: Status suffix for files (' ✓', ' [p]', ' [ ]'), None for folders
+    """
+    parts = tuple(path.split('/'))
+    for depth in range(1, len(parts)):
+        entries.setdefault(parts[:depth], None)
+    if status is not None or parts not in entries:
+        entries[parts] = status
+
+
+def _render_tree_lines(entries: Dict[Tuple[str, ...], Optional[str]]) -> List[str]:
+    """
+    Render tree entries as box-drawing lines (siblings sorted by name).
+    
+    Sorting the part tuples once gives depth-first order with sorted siblings,
+    since a parent tuple sorts before its children.
+    
+    Args:
+        entries: Mapping of path parts -> file status suffix (None for folders)
+    
+    Returns:
+        List of tree lines
+    """
+    ordered = sorted(entries)
+    
+    # Walking backwards, the first child seen for a parent is its last child
+    is_last = [False] * len(ordered)
+    parents_seen = set()
+    for i in range(len(ordered) - 1, -1, -1):
+        parent = ordered[i][:-1]
+        if parent not in parents_seen:
+            parents_seen.add(parent)
+            is_last[i] = True
+    
+    lines = []
+    prefixes = ['']  # prefixes[d] = indent for entries at depth d + 1
+    for parts, last in zip(ordered, is_last):
+        depth = len(parts)
+        prefix = prefixes[depth - 1]
+        status = entries[parts]
+        suffix = '/' if status is None else status
+        lines.append(f"{prefix}{'└── ' if last else '├── '}{parts[-1]}{suffix}")
+        del prefixes[depth:]
+        prefixes.append(prefix + ('    ' if last else '│   '))
+    
+    return lines
+
+
+def _read_tree(path: str) -> str:
+    """
+    Read tree.md, reusing the cached content while the file is unchanged.
+    
+    Args:
+        path: Path to tree.md file
+    
+    Returns:
+        File content
+    """
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    with _TREE_CACHE_LOCK:
+        entry = _TREE_CACHE.get(path)
+    if entry and entry[0] == key:
+        return entry[1]
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    with _TREE_CACHE_LOCK:
+        _TREE_CACHE[path] = (key, content)
+    return content
+
+
+def _atomic_write(path: str, data: str) -> None:
+    """
+    Replace a file's content atomically and durably.
+    
+    Writes a temp file next to it, syncs it to disk, then renames it over the
+    target, so a run killed mid-write leaves either the old or the new file.
+    
+    Args:
+        path: File to write
+        data: New content (written as UTF-8)
+    """
+    tmp_file = path + '.tmp'
+    fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data.encode('utf-8'))
+        # fdatasync is POSIX-only (missing on macOS/Windows); fsync works everywhere
+        getattr(os, 'fdatasync', os.fsync)(fd)
+        # The rename keeps mtime and size, so this is the key _read_tree will see
+        st = os.fstat(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_file, path)
+    # Keep what we just wrote: the next read-modify-write skips the re-read
+    with _TREE_CACHE_LOCK:
+        _TREE_CACHE[path] = ((st.st_mtime_ns, st.st_size), data)
+
+
+def _write_tree_md(tree_file_path: str, tree_lines: List[str], file_lines: List[str]) -> None:
+    """
+    Write tree.md (tree block, status legend, file list) in a single write.
+    
+    Args:
+        tree_file_path: Path to tree.md file
+        tree_lines: Rendered tree lines
+        file_lines: Lines of the "Файлы" section
+    """
+    content = ''.join((
+        "# Структура папок и файлов\n\n```\n",
+        ''.join(line + '\n' for line in tree_lines),
+        "```\n\n"
+        "## Статус загрузки\n\n"
+        "- ✓ или [x] = файл полностью загружен (скачан и залит на Яндекс Диск)\n"
+        "- [p] = файл загружен частично (скачан на компьютер, но не залит на Яндекс Диск)\n"
+        "- [ ] = файл не загружен\n\n"
+        "## Файлы\n\n",
+        ''.join(line + '\n' for line in file_lines),
+    ))
+    _atomic_write(tree_file_path, content)
+
+
 def create_structure_tree(video_files: List[Dict], folder_info: List[Dict], tree_file_path: str, verbose: bool = False) -> None:
     """
     Create or update structure tree in markdown file.
@@ -2488,128 +3250,188 @@ def create_structure_tree(video_files: List[Dict], folder_info: List[Dict], tree
         tree_file_path: Path to tree.md file
         verbose: Enable verbose output
     """
-    # Build tree structure from video files and folders
-    tree_structure = {}
-    
-    # First, add all folders to the tree structure
-    for folder in folder_info:
-        folder_path = folder.get('path', folder.get('name', ''))
-        if folder_path:
-            path_parts = folder_path.split('/')
-            current = tree_structure
-            for part in path_parts:
-                if part not in current:
-                    current[part] = {'type': 'folder', 'children': {}}
-                current = current[part]['children']
-    
-    # Then, add video files to the tree structure
-    for video in video_files:
-        relative_path = video.get('relative_path', video['name'])
-        path_parts = relative_path.split('/')
-        
-        current = tree_structure
-        for i, part in enumerate(path_parts):
-            if i == len(path_parts) - 1:
-                # Last part is the file - mark as not downloaded [ ]
-                current[part] = {'type': 'file', 'downloaded': False}
-            else:
-                # It's a folder - create if doesn't exist
-                if part not in current:
-                    current[part] = {'type': 'folder', 'children': {}}
-                current = current[part]['children']
-    
     # Read existing tree.md if it exists to preserve downloaded status
     downloaded_files = set()
     partially_downloaded_files = set()
     if os.path.exists(tree_file_path):
         try:
-            with open(tree_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                import re
-                for line in content.split('\n'):
-                    if '✓' in line or '[x]' in line.lower():
-                        match = re.search(r'`([^`]+)`', line)
-                        if match:
-                            downloaded_files.add(match.group(1))
-                    elif '[p]' in line.lower():
-                        match = re.search(r'`([^`]+)`', line)
-                        if match:
-                            partially_downloaded_files.add(match.group(1))
+            content = _read_tree(tree_file_path)
+            # Only "- [x] `path`" style entries carry a path; tree block lines don't
+            for line in content.splitlines():
+                if '`' not in line:
+                    continue
+                match = _STATUS_LINE_RE.match(line)
+                if match:
+                    status, path = match.group(1, 2)
+                    if status is None or status in 'xX':
+                        downloaded_files.add(path)
+                    elif status in 'pP':
+                        partially_downloaded_files.add(path)
         except Exception as e:
             if verbose:
                 print(f"Warning: Could not read existing tree.md: {e}")
     
-    # Mark files as downloaded or partially downloaded if they were already marked
-    def mark_downloaded(node, path=''):
-        for key, value in node.items():
-            current_path = f"{path}/{key}" if path else key
-            if isinstance(value, dict):
-                if value.get('type') == 'file':
-                    if current_path in downloaded_files:
-                        value['downloaded'] = True
-                    elif current_path in partially_downloaded_files:
-                        value['partially_downloaded'] = True
-                elif value.get('type') == 'folder':
-                    mark_downloaded(value.get('children', {}), current_path)
-    
-    mark_downloaded(tree_structure)
-    
-    # Generate markdown tree
-    def build_tree_markdown(node, indent=0, prefix=''):
-        lines = []
-        items = sorted(node.items())
-        for i, (name, value) in enumerate(items):
-            is_last = i == len(items) - 1
-            current_prefix = '└── ' if is_last else '├── '
-            next_prefix = prefix + ('    ' if is_last else '│   ')
-            
-            if isinstance(value, dict):
-                if value.get('type') == 'file':
-                    # It's a file - show with status [ ] by default
-                    if value.get('downloaded', False):
-                        status = ' ✓'
-                    elif value.get('partially_downloaded', False):
-                        status = ' [p]'
-                    else:
-                        status = ' [ ]'  # Not downloaded
-                    lines.append(f"{prefix}{current_prefix}{name}{status}")
-                elif value.get('type') == 'folder':
-                    # It's a folder - show with / and process children
-                    lines.append(f"{prefix}{current_prefix}{name}/")
-                    lines.extend(build_tree_markdown(value.get('children', {}), indent + 1, next_prefix))
-        
-        return lines
+    # Flat path -> status map; rendering sorts it once
+    entries = {}
+    for folder in folder_info:
+        folder_path = folder.get('path', folder.get('name', ''))
+        if folder_path:
+            _add_tree_entry(entries, folder_path)
+    for video in video_files:
+        relative_path = video.get('relative_path', video['name'])
+        if relative_path in downloaded_files:
+            status = ' ✓'
+        elif relative_path in partially_downloaded_files:
+            status = ' [p]'
+        else:
+            status = ' [ ]'  # Not downloaded
+        _add_tree_entry(entries, relative_path, status)
     
-    tree_lines = build_tree_markdown(tree_structure)
+    tree_lines = _render_tree_lines(entries)
+    
+    # Remove leading slash if present (paths should be relative, not absolute)
+    list_paths = [video.get('relative_path', video['name']).lstrip('/')
+                  for video in sorted(video_files, key=lambda x: x.get('relative_path', x['name']))]
+    file_lines = [
+        f"- [{'x' if path in downloaded_files else 'p' if path in partially_downloaded_files else ' '}] `{path}`"
+        for path in list_paths
+    ]
     
     # Write to file
-    with open(tree_file_path, 'w', encoding='utf-8') as f:
-        f.write("# Структура папок и файлов\n\n")
-        f.write("```\n")
-        for line in tree_lines:
-            f.write(line + '\n')
-        f.write("```\n\n")
-        f.write("## Статус загрузки\n\n")
-        f.write("- ✓ или [x] = файл полностью загружен (скачан и залит на Яндекс Диск)\n")
-        f.write("- [p] = файл загружен частично (скачан на компьютер, но не залит на Яндекс Диск)\n")
-        f.write("- [ ] = файл не загружен\n\n")
-        f.write("## Файлы\n\n")
-        for video in sorted(video_files, key=lambda x: x.get('relative_path', x['name'])):
-            relative_path = video.get('relative_path', video['name'])
-            # Remove leading slash if present (paths should be relative, not absolute)
-            relative_path = relative_path.lstrip('/')
-            if relative_path in downloaded_files:
-                status = 'x'
-            elif relative_path in partially_downloaded_files:
-                status = 'p'
-            else:
-                status = ' '  # Not downloaded
-            f.write(f"- [{status}] `{relative_path}`\n")
+    _write_tree_md(tree_file_path, tree_lines, file_lines)
     
     if verbose:
         print(f"Structure tree saved to {tree_file_path}")
 
 
+@functools.lru_cache(maxsize=4096)
+def _path_patterns(relative_path: str) -> Dict[str, Any]:
+    """
+    Compile the tree.md patterns for one file (cached per path).
+    
+    Args:
+        relative_path: Relative path of the file
+    
+    Returns:
+        Dict of compiled patterns: 'listed' ([ ]/[p]/[x] entry), 'mark_partial' and
+        'mark_done' (list entry still to be marked); callers must not modify it
+    """
+    escaped_path = re.escape(relative_path)
+    return {
+        'listed': re.compile(rf'(\[[px ]\] `{escaped_path}`)'),
+        'mark_partial': re.compile(rf'\[ \] `{escaped_path}`'),
+        'mark_done': re.compile(rf'\[[px ]\] `{escaped_path}`'),
+    }
+
+
+def _mark_tree_node(content: str, relative_path: str, from_statuses: Tuple[str, ...],
+                    node_status: str) -> str:
+    """
+    Set the status of one file node in the ``` tree block of tree.md content.
+    
+    Nodes only carry their own name, so the block is walked with the same
+    indent/path stack as read_files_from_tree and only the node whose joined
+    path equals relative_path is rewritten (files with the same name in other
+    folders keep their status).
+    
+    Args:
+        content: Current tree.md content
+        relative_path: Relative path of the file
+        from_statuses: Node statuses that may be replaced ('[ ]', '[p]', ...)
+        node_status: New node status ('[p]' or '✓')
+    
+    Returns:
+        Updated content (unchanged if the node is missing or already marked)
+    """
+    tree_block_match = _TREE_BLOCK_RE.search(content)
+    if not tree_block_match:
+        return content
+    
+    parts = relative_path.split('/')
+    current_path = []
+    offset = tree_block_match.start(1)
+    for line in tree_block_match.group(1).split('\n'):
+        match = _TREE_NODE_RE.match(line)
+        if match:
+            level = len(match.group(1)) // 4
+            name = match.group(2).strip()
+            is_folder = name.endswith('/')
+            del current_path[level:]
+            current_path.append(name[:-1] if is_folder else name)
+            if not is_folder and current_path == parts:
+                if match.group(3) not in from_statuses:
+                    return content
+                start = offset + match.start(3)
+                return content[:start] + node_status + content[offset + match.end(3):]
+        offset += len(line) + 1
+    
+    return content
+
+
+def _apply_mark(content: str, relative_path: str, state: str) -> str:
+    """
+    Apply one status mark to tree.md content.
+    
+    Args:
+        content: Current tree.md content
+        relative_path: Relative path of the file
+        state: 'partial' ([p]) or 'done' ([x] / ✓)
+    
+    Returns:
+        Updated content
+    """
+    patterns = _path_patterns(relative_path)
+    if state == 'partial':
+        # [ ] -> [p], in the list and in the tree structure
+        entry = f'[p] `{relative_path}`'
+        content = patterns['mark_partial'].sub(lambda match: entry, content)
+        return _mark_tree_node(content, relative_path, ('[ ]',), '[p]')
+    # [ ]/[p] -> [x] in the list, -> ✓ in the tree structure
+    entry = f'[x] `{relative_path}`'
+    content = patterns['mark_done'].sub(lambda match: entry, content)
+    return _mark_tree_node(content, relative_path, ('[ ]', '[p]'), '✓')
+
+
+def _flush_marks(tree_file_path: str, verbose: bool = False) -> None:
+    """
+    Write all pending marks for tree_file_path with a single read and write.
+    
+    Marks queued by other workers while this one waited for the lock are
+    written together, so concurrent transfers share one tree.md rewrite.
+    
+    Args:
+        tree_file_path: Path to tree.md file
+        verbose: Enable verbose output
+    """
+    with _TREE_LOCK:
+        with _PENDING_LOCK:
+            marks = _PENDING_MARKS.pop(tree_file_path, None)
+        if not marks:
+            # Already written by the worker that held the lock before us
+            return
+        
+        content = _read_tree(tree_file_path)
+        
+        new_content = content
+        for relative_path, state in marks:
+            new_content = _apply_mark(new_content, relative_path, state)
+        
+        if new_content != content:
+            # One synced rewrite per batch of marks
+            _atomic_write(tree_file_path, new_content)
+            if verbose:
+                for relative_path, state in marks:
+                    if state == 'partial':
+                        print(f"  Marked {relative_path} as partially downloaded [p]")
+                    else:
+                        print(f"  Marked {relative_path} as downloaded [x]")
+
+
+def _queue_mark(relative_path: str, state: str, tree_file_path: str) -> None:
+    with _PENDING_LOCK:
+        _PENDING_MARKS.setdefault(tree_file_path, []).append((relative_path, state))
+
+
 def mark_file_partially_downloaded(relative_path: str, tree_file_path: str, verbose: bool = False) -> None:
     """
     Mark file as partially downloaded (downloaded locally but not uploaded) in tree.md.
@@ -2623,25 +3445,8 @@ def mark_file_partially_downloaded(relative_path: str, tree_file_path: str, verb
         return
     
     try:
-        with open(tree_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Replace [ ] with [p] for this file
-        import re
-        pattern = rf'(\[ \] `{re.escape(relative_path)}`)'
-        replacement = f'[p] `{relative_path}`'
-        new_content = re.sub(pattern, replacement, content)
-        
-        # Also replace in tree structure
-        pattern2 = rf'(\[ \])(\s*{re.escape(os.path.basename(relative_path))})'
-        replacement2 = f'[p]\\2'
-        new_content = re.sub(pattern2, replacement2, new_content)
-        
-        if new_content != content:
-            with open(tree_file_path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            if verbose:
-                print(f"  Marked {relative_path} as partially downloaded [p]")
+        _queue_mark(relative_path, 'partial', tree_file_path)
+        _flush_marks(tree_file_path, verbose)
     except Exception as e:
         if verbose:
             print(f"  Warning: Could not mark file as partially downloaded: {e}")
@@ -2660,30 +3465,58 @@ def mark_file_downloaded(relative_path: str, tree_file_path: str, verbose: bool
         return
     
     try:
-        with open(tree_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Replace [p] or [ ] with [x] for this file
-        import re
-        pattern = rf'(\[[px ]\] `{re.escape(relative_path)}`)'
-        replacement = f'[x] `{relative_path}`'
-        new_content = re.sub(pattern, replacement, content)
-        
-        # Also replace in tree structure (✓ or [p] or [ ] with ✓)
-        pattern2 = rf'(\[p\]|\[ \])(\s*{re.escape(os.path.basename(relative_path))})'
-        replacement2 = f' ✓\\2'
-        new_content = re.sub(pattern2, replacement2, new_content)
-        
-        if new_content != content:
-            with open(tree_file_path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            if verbose:
-                print(f"  Marked {relative_path} as downloaded [x]")
+        _queue_mark(relative_path, 'done', tree_file_path)
+        _flush_marks(tree_file_path, verbose)
     except Exception as e:
         if verbose:
             print(f"  Warning: Could not mark file as downloaded: {e}")
 
 
+class TreeMarker:
+    """
+    Collects tree.md marks and writes them in one rewrite.
+    
+    Use as a context manager when marking many files in a row; the marks are
+    flushed on exit (also on error), or earlier with flush().
+    
+        with TreeMarker(tree_file_path) as marker:
+            for path in done_paths:
+                marker.mark(path, 'done')
+    """
+    
+    def __init__(self, tree_file_path: str, verbose: bool = False):
+        self.tree_file_path = tree_file_path
+        self.verbose = verbose
+    
+    def mark(self, relative_path: str, state: str) -> None:
+        """
+        Queue a mark without writing tree.md yet.
+        
+        Args:
+            relative_path: Relative path of the file
+            state: 'partial' ([p]) or 'done' ([x] / ✓)
+        """
+        _queue_mark(relative_path, state, self.tree_file_path)
+    
+    def flush(self) -> None:
+        """Write all queued marks (no-op if tree.md doesn't exist)."""
+        if not os.path.exists(self.tree_file_path):
+            with _PENDING_LOCK:
+                _PENDING_MARKS.pop(self.tree_file_path, None)
+            return
+        try:
+            _flush_marks(self.tree_file_path, self.verbose)
+        except Exception as e:
+            if self.verbose:
+                print(f"  Warning: Could not update tree.md: {e}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.flush()
+
+
 def read_files_from_tree(tree_file_path: str, folder_filter: Optional[str] = None) -> List[Dict]:
     """
     Read list of video files from tree.md file.
@@ -2701,16 +3534,14 @@ def read_files_from_tree(tree_file_path: str, folder_filter: Optional[str] = Non
         return files
     
     try:
-        with open(tree_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = _read_tree(tree_file_path)
         
         # Extract files from "## Файлы" section
-        files_section_match = re.search(r'## Файлы\s*\n\n(.*?)(?=\n\n|$)', content, re.DOTALL)
+        files_section_match = _FILES_SECTION_RE.search(content)
         if files_section_match:
             files_text = files_section_match.group(1)
             # Match lines like: - [ ] `path/to/file.mp4` or - [p] `/path/to/file.mp4`
-            pattern = r'- \[[px ]\]\s*`?([^`\n]+)`?'
-            matches = re.findall(pattern, files_text)
+            matches = _FILE_LINE_RE.findall(files_text)
             for match in matches:
                 relative_path = match.strip().lstrip('/')  # Remove leading slash
                 if not relative_path:
@@ -2724,47 +3555,43 @@ def read_files_from_tree(tree_file_path: str, folder_filter: Optional[str] = Non
                     'name': os.path.basename(relative_path)
                 })
         
-        # Also extract from tree structure (``` block)
-        tree_block_match = re.search(r'```\s*\n(.*?)\n```', content, re.DOTALL)
+        # Also extract from tree structure (``` block): files missing from the list
+        tree_block_match = _TREE_BLOCK_RE.search(content)
         if tree_block_match:
-            tree_lines = tree_block_match.group(1).split('\n')
+            listed = {file['relative_path'] for file in files}
             current_path = []
-            for line in tree_lines:
+            for line in tree_block_match.group(1).splitlines():
                 # Parse tree structure lines like: │   ├── file.mp4 [ ]
-                line = line.strip()
-                if not line:
+                match = _TREE_NODE_RE.match(line)
+                if not match:
                     continue
                 
-                # Count indentation
-                indent = len(line) - len(line.lstrip())
-                level = indent // 4  # Assuming 4 spaces per level
+                # Every level of nesting adds one 4-character "│   " / "    " unit
+                level = len(match.group(1)) // 4
+                name = match.group(2).strip()
+                # Remove trailing / for folders
+                is_folder = name.endswith('/')
+                if is_folder:
+                    name = name[:-1]
                 
-                # Extract name and status
-                match = re.search(r'[├└]──\s*([^[]+?)(\s*\[[px ]\]|\s*✓)?$', line)
-                if match:
-                    name = match.group(1).strip()
-                    # Remove trailing / for folders
-                    if name.endswith('/'):
-                        name = name[:-1]
-                        is_folder = True
-                    else:
-                        is_folder = False
-                    
-                    # Update current path based on level
-                    current_path = current_path[:level]
-                    current_path.append(name)
-                    
-                    # If it's a file (has video extension), add it
-                    if not is_folder and any(name.lower().endswith(ext) for ext in VIDEO_EXTENSIONS):
-                        relative_path = '/'.join(current_path)
-                        # Apply folder filter if specified
-                        if folder_filter:
-                            if not (relative_path.startswith(folder_filter + '/') or relative_path == folder_filter):
-                                continue
-                        files.append({
-                            'relative_path': relative_path,
-                            'name': name
-                        })
+                # Update current path based on level
+                del current_path[level:]
+                current_path.append(name)
+                
+                # If it's a file (has video extension), add it
+                if not is_folder and name.lower().endswith(VIDEO_EXTENSIONS):
+                    relative_path = '/'.join(current_path)
+                    if relative_path in listed:
+                        continue
+                    # Apply folder filter if specified
+                    if folder_filter:
+                        if not (relative_path.startswith(folder_filter + '/') or relative_path == folder_filter):
+                            continue
+                    listed.add(relative_path)
+                    files.append({
+                        'relative_path': relative_path,
+                        'name': name
+                    })
     
     except Exception as e:
         print(f"Warning: Could not read tree.md: {e}")
@@ -2786,6 +3613,7 @@ def find_file_on_page(page, file_name: str, folder_url: str, folder_path: str, v
     Returns:
         Download URL if found, None otherwise
     """
+    site_base = _site_base(folder_url)
     try:
         # Navigate to folder if needed
         current_url = page.url
@@ -2793,30 +3621,12 @@ def find_file_on_page(page, file_name: str, folder_url: str, folder_path: str, v
             if verbose:
                 print(f"  Navigating to folder: {folder_path}")
             page.goto(folder_url, wait_until='domcontentloaded', timeout=60000)
-            page.wait_for_timeout(3000)
-            
-            # Check for captcha
-            captcha_selectors = [
-                'text=/[Рр]обот|[Cc]aptcha|[Пп]одтвердите/',
-                '[class*="captcha"]',
-                '[class*="Captcha"]',
-                '[id*="captcha"]',
-                '[id*="Captcha"]',
-                'iframe[src*="captcha"]',
-                'iframe[src*="smartcaptcha"]'
-            ]
+            _wait_for_listing(page)
             
+            # Check for captcha (one round-trip per poll)
             captcha_solved = False
             while not captcha_solved:
-                captcha_found = False
-                for selector in captcha_selectors:
-                    try:
-                        elements = page.query_selector_all(selector)
-                        if elements and len(elements) > 0:
-                            captcha_found = True
-                            break
-                    except:
-                        continue
+                captcha_found = _is_captcha_present(page)
                 
                 if captcha_found:
                     print("\n" + "="*60)
@@ -2825,100 +3635,65 @@ def find_file_on_page(page, file_name: str, folder_url: str, folder_path: str, v
                     print("After solving, press ENTER to continue...")
                     print("="*60 + "\n")
                     input("Press ENTER after solving captcha...")
-                    page.wait_for_timeout(3000)
+                    page.wait_for_load_state('domcontentloaded')
                     
-                    captcha_still_present = False
-                    for selector in captcha_selectors:
-                        try:
-                            elements = page.query_selector_all(selector)
-                            if elements and len(elements) > 0:
-                                captcha_still_present = True
-                                break
-                        except:
-                            continue
+                    captcha_still_present = _is_captcha_present(page)
                     
                     if not captcha_still_present:
                         captcha_solved = True
                         print("Captcha solved! Continuing...\n")
-                        page.wait_for_timeout(2000)
+                        _wait_for_listing(page)
                 else:
                     captcha_solved = True
         
-        # Get all elements
-        all_elements = page.query_selector_all(
-            'a[href*="/d/"], '
-            '.file-item, '
-            '[data-file-name], '
-            '.listing-item, '
-            '.resource-item, '
-            '.listing-item__title, '
-            '.listing-item__title-link, '
-            '.resource__name, '
-            '.resource__title, '
-            '.file__name, '
-            'a.resource__name-link, '
-            'a[class*="resource"], '
-            'a[class*="file"], '
-            'a[class*="listing"]'
-        )
-        
-        if len(all_elements) == 0:
-            all_elements = page.query_selector_all('a[href]')
-        
-        # Search for file by name
+        # Match names and read links in the page, one round-trip for the whole listing
         file_name_normalized = file_name.lower().strip()
-        for element in all_elements:
+        selector = _LISTING_SELECTOR
+        matches = page.eval_on_selector_all(selector, _FIND_FILE_JS, file_name_normalized)
+        if not matches and not page.query_selector(selector):
+            selector = _FALLBACK_SELECTOR
+            matches = page.eval_on_selector_all(selector, _FIND_FILE_JS, file_name_normalized)
+        
+        for match in matches:
             try:
-                # Get name
-                name = (element.get_attribute('data-file-name') or 
-                       element.get_attribute('data-resource-name') or
-                       element.get_attribute('data-name') or
-                       element.get_attribute('title') or
-                       element.get_attribute('aria-label') or
-                       element.inner_text() or
-                       element.text_content())
-                
-                if not name:
-                    continue
-                
-                name = name.strip()
-                name_normalized = name.lower().strip()
-                
-                # Check if names match
-                if name_normalized != file_name_normalized:
-                    continue
-                
-                # Found the file! Now get download URL
-                href = element.get_attribute('href')
-                if not href:
-                    parent_link = element.query_selector('a[href]')
-                    if parent_link:
-                        href = parent_link.get_attribute('href')
+                name = match['name']
+                href = match['href']
                 
                 # If no href, try clicking to get streaming URL
                 if not href:
                     try:
                         video_urls = []
                         
-                        def handle_request(request):
-                            url = request.url
-                            if 'captcha' in url.lower() or 'smartcaptcha' in url.lower():
-                                return
-                            if 'streaming.disk.yandex.net' in url or 'streaming.disk.yandex.ru' in url:
-                                if '/hls/' in url or url.endswith('.m3u8'):
-                                    video_urls.append(url)
+                        def capture_stream(route):
+                            url = route.request.url
+                            if not _CAPTCHA_URL_RE.search(url) and _is_stream_url(url):
+                                video_urls.append(url)
+                            route.continue_()
                         
-                        page.on('request', handle_request)
-                        element.click(timeout=10000)
-                        page.wait_for_timeout(3000)
-                        # Note: Playwright doesn't have page.off() - handler will be cleaned up automatically
+                        page.route(_STREAM_REQUEST_RE, capture_stream)
+                        try:
+                            # Return on the first stream request instead of sleeping 3s;
+                            # the route may not have run yet, so record it here too
+                            clicked = False
+                            try:
+                                with page.expect_request(_STREAM_REQUEST_RE, timeout=5000) as request_info:
+                                    page.locator(selector).nth(match['index']).click(timeout=10000)
+                                    clicked = True
+                                url = request_info.value.url
+                                if (not _CAPTCHA_URL_RE.search(url) and _is_stream_url(url)
+                                        and url not in video_urls):
+                                    video_urls.append(url)
+                            except PlaywrightTimeoutError:
+                                if not clicked:
+                                    raise
+                        finally:
+                            page.unroute(_STREAM_REQUEST_RE, capture_stream)
                         
                         if video_urls:
                             href = video_urls[0]
-                            # Close overlay
+                            # Close overlay (nothing else happens on this page before returning)
                             try:
                                 page.keyboard.press('Escape')
-                                page.wait_for_timeout(500)
                             except:
                                 pass
                     except Exception as e:
@@ -2931,14 +3706,8 @@ def find_file_on_page(page, file_name: str, folder_url: str, folder_path: str, v
                     continue
                 
                 # Construct full URL
-                if href.startswith('/'):
-                    if 'disk.yandex.ru' in folder_url or 'disk.yandex.ru' in href:
-                        full_url = f"https://disk.yandex.ru{href}"
-                    else:
-                        full_url = f"https://yadi.sk{href}"
-                elif href.startswith('http'):
-                    full_url = href
-                else:
+                full_url = _absolute_url(href, site_base)
+                if not full_url:
                     continue
                 
                 if verbose:
@@ -2960,10 +3729,56 @@ def find_file_on_page(page, file_name: str, folder_url: str, folder_path: str, v
         return None
 
 
+def _parse_tree_index(content: str) -> Tuple[frozenset, frozenset]:
+    """
+    Collect the download status of every file listed in tree.md content.
+    
+    Args:
+        content: tree.md content
+    
+    Returns:
+        Tuple of (fully_downloaded_paths, partially_downloaded_paths)
+    """
+    downloaded = set()
+    partial = set()
+    for match in _STATUS_LINE_RE.finditer(content):
+        status, path = match.group(1, 2)
+        if status is None or status in 'xX':
+            downloaded.add(path)
+        elif status in 'pP':
+            partial.add(path)
+    # A file marked done anywhere is done, even if an older [p] line remains
+    return (frozenset(downloaded), frozenset(partial - downloaded))
+
+
+def load_tree_index(tree_file_path: str) -> Tuple[frozenset, frozenset]:
+    """
+    Read the download status of every file listed in tree.md in one pass.
+    
+    Args:
+        tree_file_path: Path to tree.md file
+    
+    Returns:
+        Tuple of (fully_downloaded_paths, partially_downloaded_paths)
+    """
+    if not os.path.exists(tree_file_path):
+        return (frozenset(), frozenset())
+    
+    try:
+        content = _read_tree(tree_file_path)
+    except Exception:
+        return (frozenset(), frozenset())
+    
+    return _parse_tree_index(content)
+
+
 def is_file_downloaded(relative_path: str, tree_file_path: str) -> Tuple[bool, bool]:
     """
     Check if file is already downloaded (fully or partially) according to tree.md.
     
+    Reads the whole file; when checking many files against an unchanged
+    tree.md, call load_tree_index() once instead.
+    
     Args:
         relative_path: Relative path of the file
         tree_file_path: Path to tree.md file
@@ -2975,35 +3790,124 @@ def is_file_downloaded(relative_path: str, tree_file_path: str) -> Tuple[bool, b
         return (False, False)
     
     try:
-        with open(tree_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Check for fully downloaded (✓ or [x])
-        import re
-        # Check for [x] marker
-        if re.search(rf'\[x\] `{re.escape(relative_path)}`', content):
-            return (True, False)
-        # Check for ✓ marker (can be on same line or separate)
-        if re.search(rf'✓.*`{re.escape(relative_path)}`', content) or \
-           (re.search(rf'✓', content) and relative_path in content and 
-            any(line.strip().startswith('✓') and relative_path in line for line in content.split('\n'))):
-            return (True, False)
-        
-        # Check for partially downloaded [p]
-        if f'[p] `{relative_path}`' in content:
-            import re
-            if re.search(rf'\[p\] `{re.escape(relative_path)}`', content):
-                return (False, True)
-        
+        content = _read_tree(tree_file_path)
+    except Exception:
         return (False, False)
-    except Exception as e:
+    
+    # Not mentioned at all (the common case on fresh runs): skip the regex scan
+    if relative_path not in content:
         return (False, False)
+    
+    downloaded, partial = _parse_tree_index(content)
+    return (relative_path in downloaded, relative_path in partial)
+
+
+def _transfer_video(job: Dict, tree_file_path: str, destination_path: Optional[str], oauth_token: Optional[str],
+                    cookies: Optional[Dict], verbose: bool = False) -> bool:
+    """
+    Download one video (unless already local) and upload it to Yandex Disk.
+    
+    Direct video URLs are piped from the download into the upload without a
+    local copy; streaming pages (yt-dlp) and failed pipes go through videos/.
+    Runs in a worker thread, so it never touches the Playwright page; browser
+    cookies are passed in pre-collected instead.
+    
+    Args:
+        job: Prepared video job (relative_path, download_url, local_path, path_parts, skip_download;
+             optional idx/total for progress output, remote_checked if
+             Yandex Disk was already checked for this file)
+        tree_file_path: Path to tree.md file
+        destination_path: Destination folder on Yandex Disk (upload skipped if empty)
+        oauth_token: OAuth token for Yandex Disk API (upload skipped if empty)
+        cookies: Browser cookies for direct downloads
+        verbose: Enable verbose output
+    
+    Returns:
+        True if the video was processed, False on download or upload failure
+    """
+    relative_path = job['relative_path']
+    download_url = job['download_url']
+    local_path = job['local_path']
+    path_parts = job['path_parts']
+    progress = f" ({job['idx']}/{job['total']})" if job.get('total') else ""
+    upload_enabled = bool(destination_path and oauth_token)
+    
+    if upload_enabled:
+        # Remove leading slash from relative_path if present to avoid double slashes
+        clean_relative_path = relative_path.lstrip('/')
+        # Build full destination path properly
+        if destination_path.endswith('/'):
+            full_destination = f"{destination_path}{clean_relative_path}"
+        else:
+            full_destination = f"{destination_path}/{clean_relative_path}"
+        
+        # Create folder structure on Yandex Disk
+        if len(path_parts) > 1:
+            folder_path = '/'.join(path_parts[:-1]).lstrip('/')
+            try:
+                create_folder_structure(destination_path, folder_path, oauth_token, verbose)
+            except Exception as e:
+                print(f"ERROR: Failed to upload {relative_path}: {e}")
+                return False
+        
+        # Direct video URL: pipe download into upload, no local copy
+        is_direct = download_url and download_url.lower().endswith(VIDEO_EXTENSIONS)
+        if is_direct and not job['skip_download']:
+            print(f"\nStreaming {relative_path}{progress} to {full_destination}...")
+            if upload_stream_to_yandex_disk(download_url, full_destination, oauth_token, cookies, verbose):
+                mark_file_downloaded(relative_path, tree_file_path, verbose)
+                return True
+            print(f"Warning: Streamed transfer of {relative_path} failed, falling back to local download...")
+    
+    # Download video
+    if not job['skip_download']:
+        print(f"\nDownloading {relative_path}{progress}...")
+        if not download_video(download_url, local_path, verbose, cookies=cookies):
+            print(f"ERROR: Failed to download {relative_path}")
+            return False
+        mark_file_partially_downloaded(relative_path, tree_file_path, verbose)
+    elif not os.path.exists(local_path):
+        print(f"Warning: Partially downloaded file not found at {local_path}, re-downloading...")
+        if not download_video(download_url, local_path, verbose, cookies=cookies):
+            print(f"ERROR: Failed to re-download {relative_path}")
+            return False
+    
+    # Upload to Yandex Disk
+    if not upload_enabled:
+        print(f"Skipping upload (no destination path or OAuth token)")
+        return True
+    
+    print(f"Uploading {relative_path} to {full_destination}...")
+    try:
+        # Staged files were already looked up on Yandex Disk in the batch check
+        if not upload_to_yandex_disk(local_path, full_destination, oauth_token, verbose,
+                                     check_existing=not job.get('remote_checked')):
+            raise Exception("upload returned failure")
+        mark_file_downloaded(relative_path, tree_file_path, verbose)
+    except Exception as e:
+        print(f"ERROR: Failed to upload {relative_path}: {e}")
+        return False
+    
+    # Delete local file after successful upload
+    try:
+        os.remove(local_path)
+        if verbose:
+            print(f"  Deleted local file: {local_path}")
+    except Exception as e:
+        if verbose:
+            print(f"  Warning: Could not delete local file: {e}")
+    return True
 
 
 if __name__ == '__main__':
     # Load environment variables
     load_env_file()
     
+    # Browser cleanup for every exit path (sys.exit included), run in the finally below
+    cleanup = ExitStack()
+    cleanup.callback(_BROWSER_POOL.close)
+    args = None
+    
     try:
         
         # Parse command line arguments
@@ -3068,6 +3972,7 @@ if __name__ == '__main__':
         page = None
         playwright_instance = None
         folder_info = []  # Initialize folder_info for use-tree mode
+        video_files = []
         
         # Use tree.md if requested
         if args.use_tree:
@@ -3105,47 +4010,8 @@ if __name__ == '__main__':
                 print(f"DEBUG: Created {len(video_files)} video_files in upload-only mode")
             else:
                 # Initialize browser for finding files
-                from playwright.sync_api import sync_playwright
-                playwright_instance = sync_playwright().start()
-                
-                # Try to use system Chrome instead of Chromium
-                try:
-                    import shutil
-                    chrome_paths = [
-                        '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
-                        '/Applications/Chromium.app/Contents/MacOS/Chromium',
-                        shutil.which('google-chrome'),
-                        shutil.which('chromium'),
-                        shutil.which('chromium-browser'),
-                    ]
-                    chrome_executable = None
-                    for path in chrome_paths:
-                        if path and os.path.exists(path):
-                            chrome_executable = path
-                            if args.verbose:
-                                print(f"Using system browser: {path}")
-                            break
-                    
-                    browser = playwright_instance.chromium.launch(
-                        headless=False,
-                        executable_path=chrome_executable,
-                        args=[
-                            '--enable-features=VaapiVideoDecoder',
-                            '--use-gl=egl',
-                            '--enable-hardware-acceleration',
-                        ]
-                    )
-                except Exception as e:
-                    if args.verbose:
-                        print(f"Could not use system Chrome, using Playwright Chromium: {e}")
-                    browser = playwright_instance.chromium.launch(headless=False)
-                
-                context = browser.new_context(
-                    user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    viewport={'width': 1920, 'height': 1080},
-                    java_script_enabled=True,
-                )
-                page = context.new_page()
+                playwright_instance, browser, context, page = _BROWSER_POOL.new_page(args.verbose)
+                cleanup.callback(_close_quietly, context)
                 
                 # Navigate to root folder
                 page.goto(public_folder_url, wait_until='domcontentloaded', timeout=60000)
@@ -3200,72 +4066,17 @@ if __name__ == '__main__':
                     print("Starting sequential video processing...")
                 
                 # Initialize browser
-                from playwright.sync_api import sync_playwright
-                playwright_instance = sync_playwright().start()
-                
-                # Try to use system Chrome
-                try:
-                    import shutil
-                    chrome_paths = [
-                        '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
-                        '/usr/bin/google-chrome',
-                        '/usr/bin/chromium',
-                        shutil.which('google-chrome'),
-                        shutil.which('chromium'),
-                        shutil.which('chromium-browser'),
-                    ]
-                    chrome_executable = None
-                    for path in chrome_paths:
-                        if path and os.path.exists(path):
-                            chrome_executable = path
-                            if args.verbose:
-                                print(f"Using system browser: {path}")
-                            break
-                    
-                    browser = playwright_instance.chromium.launch(
-                        headless=False,
-                        executable_path=chrome_executable,
-                        args=[
-                            '--enable-features=VaapiVideoDecoder',
-                            '--use-gl=egl',
-                            '--enable-hardware-acceleration',
-                        ]
-                    )
-                except Exception as e:
-                    if args.verbose:
-                        print(f"Could not use system Chrome, using Playwright Chromium: {e}")
-                    browser = playwright_instance.chromium.launch(headless=False)
-                
-                context = browser.new_context(
-                    user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    viewport={'width': 1920, 'height': 1080},
-                    java_script_enabled=True,
-                )
-                page = context.new_page()
+                playwright_instance, browser, context, page = _BROWSER_POOL.new_page(args.verbose)
+                cleanup.callback(_close_quietly, context)
                 
                 # Navigate to root folder
                 page.goto(public_folder_url, wait_until='domcontentloaded', timeout=60000)
                 page.wait_for_timeout(3000)
                 
                 # Handle captcha if present
-                captcha_selectors = [
-                    'iframe[src*="smartcaptcha"]',
-                    '.captcha',
-                    '#captcha',
-                    '[class*="captcha"]'
-                ]
-                
                 captcha_solved = False
                 while not captcha_solved:
-                    captcha_found = False
-                    for selector in captcha_selectors:
-                        try:
-                            elements = page.query_selector_all(selector)
-                            if elements and len(elements) > 0:
-                                captcha_found = True
-                                break
-                        except:
-                            continue
+                    captcha_found = _is_captcha_present(page)
                     
                     if captcha_found:
                         print("\n" + "="*60)
@@ -3286,16 +4097,7 @@ if __name__ == '__main__':
                 
                 # Initialize tree.md if it doesn't exist
                 if not os.path.exists(tree_file_path):
-                    with open(tree_file_path, 'w', encoding='utf-8') as f:
-                        f.write("# Структура папок и файлов\n\n")
-                        f.write("```\n")
-                        f.write("└── /\n")
-                        f.write("```\n\n")
-                        f.write("## Статус загрузки\n\n")
-                        f.write("- ✓ или [x] = файл полностью загружен (скачан и залит на Яндекс Диск)\n")
-                        f.write("- [p] = файл загружен частично (скачан на компьютер, но не залит на Яндекс Диск)\n")
-                        f.write("- [ ] = файл не загружен\n\n")
-                        f.write("## Файлы\n\n")
+                    _write_tree_md(tree_file_path, ["└── /"], [])
                     if args.verbose:
                         print(f"Created initial tree.md file: {tree_file_path}")
                 
@@ -3314,44 +4116,11 @@ if __name__ == '__main__':
                     destination_path, oauth_token
                 )
                 
-                # Cleanup
-                if context:
-                    try:
-                        context.close()
-                    except:
-                        pass
-                if browser:
-                    try:
-                        browser.close()
-                    except:
-                        pass
-                if playwright_instance:
-                    try:
-                        playwright_instance.stop()
-                    except:
-                        pass
-                
                 print("\nSequential processing completed successfully!")
                 sys.exit(EXIT_SUCCESS)
                 
             except Exception as e:
                 print(f"Error during processing: {e}")
-                # Cleanup on error
-                if 'context' in locals() and context:
-                    try:
-                        context.close()
-                    except:
-                        pass
-                if 'browser' in locals() and browser:
-                    try:
-                        browser.close()
-                    except:
-                        pass
-                if 'playwright_instance' in locals() and playwright_instance:
-                    try:
-                        playwright_instance.stop()
-                    except:
-                        pass
                 sys.exit(EXIT_ERROR)
             
             # Sequential processing is complete, exit
@@ -3363,61 +4132,28 @@ if __name__ == '__main__':
             if args.folder:
                 folder_name = args.folder
                 original_count = len(video_files)
-                video_files = [v for v in video_files if v.get('relative_path', v['name']).startswith(folder_name + '/') or v.get('relative_path', v['name']) == folder_name]
+                # Both --use-tree branches always set relative_path
+                folder_prefix = folder_name + '/'
+                video_files = [v for v in video_files
+                               if v['relative_path'] == folder_name or v['relative_path'].startswith(folder_prefix)]
                 if args.verbose:
                     print(f"Filtered to folder '{folder_name}': {len(video_files)}/{original_count} files")
                 if not video_files:
                     print(f"No video files found in folder '{folder_name}'")
                     if not args.parse_only:
-                        # Cleanup browser before exit
-                        if context:
-                            try:
-                                context.close()
-                            except:
-                                pass
-                        if browser:
-                            try:
-                                browser.close()
-                            except:
-                                pass
-                        if playwright_instance:
-                            try:
-                                playwright_instance.stop()
-                            except:
-                                pass
                         sys.exit(EXIT_SUCCESS)
             
             # Even if no videos found, continue to create folder structure
             if not video_files:
                 if not args.parse_only:
                     print("No video files found in folder.")
-                    # Cleanup browser before exit
-                    if context:
-                        try:
-                            context.close()
-                        except:
-                            pass
-                    if browser:
-                        try:
-                            browser.close()
-                        except:
-                            pass
-                    if playwright_instance:
-                        try:
-                            playwright_instance.stop()
-                        except:
-                            pass
                     sys.exit(EXIT_SUCCESS)
                 else:
                     print("No video files found in folder, but continuing to create folder structure...")
         
         # Common processing section for both use-tree and normal parsing modes
         # Sort by order
-        if 'video_files' in locals() and video_files:
-            video_files.sort(key=lambda x: x.get('order', 0))
-        else:
-            if 'video_files' not in locals():
-                video_files = []
+        video_files.sort(key=lambda x: x.get('order', 0))
         
         total_found = len(video_files)
         
@@ -3441,112 +4177,48 @@ if __name__ == '__main__':
         # Create structure tree in tree.md (only if not using tree.md)
         if not args.use_tree:
             if video_files:
-                # Get folder_info if available (only in parsing mode)
-                folder_info = folder_info if 'folder_info' in locals() else []
                 create_structure_tree(video_files, folder_info, tree_file_path, args.verbose)
                 print(f"Structure tree created/updated: {tree_file_path}")
-            elif 'folder_info' in locals() and folder_info:
+            elif folder_info:
                 # Create folder structure tree if no videos but folders exist
                 print(f"Creating folder structure tree (no videos found, but {len(folder_info)} folder(s) found)...")
-                tree_structure = {}
+                entries = {}
                 for folder in folder_info:
                     folder_path = folder.get('path', folder.get('name', ''))
-                    path_parts = folder_path.split('/')
-                    current = tree_structure
-                    for part in path_parts:
-                        if part not in current:
-                            current[part] = {'type': 'folder', 'children': {}}
-                        current = current[part]['children']
-                
-                def build_tree_markdown(node, indent=0, prefix=''):
-                    lines = []
-                    items = sorted(node.items())
-                    for i, (name, value) in enumerate(items):
-                        is_last = i == len(items) - 1
-                        current_prefix = '└── ' if is_last else '├── '
-                        next_prefix = prefix + ('    ' if is_last else '│   ')
-                        
-                        if isinstance(value, dict):
-                            if value.get('type') == 'folder':
-                                lines.append(f"{prefix}{current_prefix}{name}/")
-                                lines.extend(build_tree_markdown(value.get('children', {}), indent + 1, next_prefix))
-                    
-                    return lines
-                
-                tree_lines = build_tree_markdown(tree_structure)
-                
-                with open(tree_file_path, 'w', encoding='utf-8') as f:
-                    f.write("# Структура папок и файлов\n\n")
-                    f.write("```\n")
-                    for line in tree_lines:
-                        f.write(line + '\n')
-                    f.write("```\n\n")
-                    f.write("## Статус загрузки\n\n")
-                    f.write("- ✓ или [x] = файл полностью загружен (скачан и залит на Яндекс Диск)\n")
-                    f.write("- [p] = файл загружен частично (скачан на компьютер, но не залит на Яндекс Диск)\n")
-                    f.write("- [ ] = файл не загружен\n\n")
-                    f.write("## Файлы\n\n")
-                    f.write("(Видеофайлы не найдены)\n")
+                    if folder_path:
+                        _add_tree_entry(entries, folder_path)
+                _write_tree_md(tree_file_path, _render_tree_lines(entries), ["(Видеофайлы не найдены)"])
                 print(f"Structure tree created: {tree_file_path}")
         
         # Create folder structure in videos/ directory
         cache_dir = os.path.join(script_dir, 'videos')
         os.makedirs(cache_dir, exist_ok=True)
         
-        # Collect all folder paths from video files and folder_info
-        all_folder_paths = set()
+        # Folders of the video files and folder_info entries; many videos share a
+        # folder, so each distinct folder is cleaned once
+        raw_folder_paths = {video.get('relative_path', video['name']).rpartition('/')[0] for video in video_files}
+        raw_folder_paths.update(folder.get('path', folder.get('name', '')) for folder in folder_info)
+        raw_folder_paths.discard('')
         
-        # Add folders from video files
-        for video in video_files:
-            relative_path = video.get('relative_path', video['name'])
-            path_parts = relative_path.split('/')
-            
-            if len(path_parts) > 1:
-                for i in range(1, len(path_parts)):
-                    folder_path = '/'.join(path_parts[:i])
-                    all_folder_paths.add(folder_path)
-        
-        # Add folders from folder_info
-        import re
-        cleaned_folder_paths = set()
-        # folder_info may not be defined in upload-only mode
-        if 'folder_info' in locals() and folder_info:
-            for folder in folder_info:
-                folder_path = folder.get('path', folder.get('name', ''))
-                if folder_path:
-                    path_parts = folder_path.split('/')
-                    cleaned_parts = []
-                    for part in path_parts:
-                        cleaned_part = re.sub(r'\s*\d{1,2}\.\d{1,2}\.\d{2,4}.*$', '', part).strip()
-                        if not cleaned_part or len(cleaned_part) < 2:
-                            cleaned_part = part
-                        cleaned_parts.append(cleaned_part)
-                    cleaned_path = '/'.join(cleaned_parts)
-                    cleaned_folder_paths.add(cleaned_path)
-                    for i in range(1, len(cleaned_parts)):
-                        parent_path = '/'.join(cleaned_parts[:i])
-                        cleaned_folder_paths.add(parent_path)
-        
-        if cleaned_folder_paths:
-            all_folder_paths.update(cleaned_folder_paths)
-        
-        # Create folder structure
+        # Create folder structure: cleaned paths plus all their parents
         final_folder_paths = set()
-        for folder_path in all_folder_paths:
-            path_parts = folder_path.split('/')
-            cleaned_parts = []
-            for part in path_parts:
-                cleaned_part = re.sub(r'\s*\d{1,2}\.\d{1,2}\.\d{2,4}.*$', '', part).strip()
-                if not cleaned_part or len(cleaned_part) < 2:
-                    cleaned_part = part
-                cleaned_parts.append(cleaned_part)
-            final_path = '/'.join(cleaned_parts)
-            final_folder_paths.add(final_path)
-        
-        for folder_path in sorted(final_folder_paths):
+        for folder_path in raw_folder_paths:
+            # Extend one running prefix instead of re-joining every slice
+            prefix = None
+            for part in folder_path.split('/'):
+                part = _clean_folder_part(part)
+                prefix = part if prefix is None else f'{prefix}/{part}'
+                final_folder_paths.add(prefix)
+        
+        # makedirs creates the parents, so only leaf folders need a call; sorted by
+        # components, a folder's subfolders directly follow it
+        ordered_paths = sorted(final_folder_paths, key=lambda path: path.split('/'))
+        leaf_paths = [path for path, next_path in zip(ordered_paths, ordered_paths[1:] + [None])
+                      if next_path is None or not next_path.startswith(path + '/')]
+        for folder_path in leaf_paths:
             path_parts = folder_path.split('/')
             sanitized_folder_parts = [sanitize_folder_name(part) for part in path_parts]
-            local_folder_path = os.path.join(cache_dir, *sanitized_folder_parts)
+            local_folder_path = os.sep.join((cache_dir, *sanitized_folder_parts))
             os.makedirs(local_folder_path, exist_ok=True)
             if args.verbose:
                 print(f"  Created folder: {local_folder_path}")
@@ -3556,49 +4228,15 @@ if __name__ == '__main__':
             print("Browser will remain open for 10 seconds for inspection, then will close automatically.")
             print("Press Ctrl+C to close immediately.")
             try:
-                import time
                 time.sleep(10)
             except KeyboardInterrupt:
                 print("\nClosing browser...")
-            # Cleanup browser
-            if 'context' in locals() and context:
-                try:
-                    context.close()
-                except:
-                    pass
-            if 'browser' in locals() and browser:
-                try:
-                    browser.close()
-                except:
-                    pass
-            if 'playwright_instance' in locals() and playwright_instance:
-                try:
-                    playwright_instance.stop()
-                except:
-                    pass
             sys.exit(EXIT_SUCCESS)
         
         # If download_immediately was enabled, videos are already processed
-        download_immediately_used = 'download_immediately' in locals() and download_immediately
-        if download_immediately_used and total_videos == 0:
+        if download_immediately and total_videos == 0:
             print("\nAll videos have been processed immediately during parsing.")
             print("No additional download/upload needed.")
-            # Cleanup browser
-            if 'context' in locals() and context:
-                try:
-                    context.close()
-                except:
-                    pass
-            if 'browser' in locals() and browser:
-                try:
-                    browser.close()
-                except:
-                    pass
-            if 'playwright_instance' in locals() and playwright_instance:
-                try:
-                    playwright_instance.stop()
-                except:
-                    pass
             sys.exit(EXIT_SUCCESS)
         
         # Download and upload videos
@@ -3617,13 +4255,19 @@ if __name__ == '__main__':
         successful = 0
         failed = 0
         
+        # Checks and local paths are prepared here; only the network work goes to the pool.
+        # Nothing is marked while preparing, so tree.md is indexed once for all files
+        jobs = []
+        downloaded_paths, partial_paths = load_tree_index(tree_file_path)
+        # Local folders already made for earlier videos (most videos share one)
+        local_folders = set()
         for idx, video in enumerate(video_files, 1):
             video_name = video['name']
             download_url = video.get('download_url')
             relative_path = video.get('relative_path', video_name)
             
             # Clean relative_path: remove leading slash and newlines
-            relative_path = relative_path.lstrip('/').replace('\n', ' ').replace('\r', ' ').strip()
+            relative_path = relative_path.lstrip('/').translate(_NEWLINE_TO_SPACE).strip()
             
             # In upload-only mode, download_url is not required
             if not args.upload_only and not download_url:
@@ -3632,7 +4276,8 @@ if __name__ == '__main__':
                 continue
             
             # Check if file is already downloaded
-            is_fully_downloaded, is_partially_downloaded = is_file_downloaded(relative_path, tree_file_path)
+            is_fully_downloaded = relative_path in downloaded_paths
+            is_partially_downloaded = relative_path in partial_paths
             if is_fully_downloaded:
                 print(f"Skipping {relative_path} ({idx}/{total_videos}) - already fully downloaded")
                 successful += 1
@@ -3640,20 +4285,23 @@ if __name__ == '__main__':
             
             # Build local path
             # Clean path parts: remove empty parts and newlines
-            path_parts = [part.strip().replace('\n', ' ').replace('\r', ' ') for part in relative_path.split('/') if part.strip()]
+            # relative_path has no line breaks left, so each part only needs a strip
+            path_parts = [part for part in map(str.strip, relative_path.split('/')) if part]
             sanitized_parts = [sanitize_folder_name(part) if i < len(path_parts) - 1 else sanitize_filename(part) 
                                for i, part in enumerate(path_parts)]
             
+            # Plain separator join: the parts are already sanitized, so
+            # os.path.join's per-part checks buy nothing here
+            local_path = os.sep.join((cache_dir, *sanitized_parts))
             if len(path_parts) > 1:
-                folder_parts = sanitized_parts[:-1]
-                local_folder_path = os.path.join(cache_dir, *folder_parts)
-                os.makedirs(local_folder_path, exist_ok=True)
-            
-            local_path = os.path.join(cache_dir, *sanitized_parts)
+                local_folder_path = os.path.dirname(local_path)
+                if local_folder_path not in local_folders:
+                    os.makedirs(local_folder_path, exist_ok=True)
+                    local_folders.add(local_folder_path)
             
             # In upload-only mode, skip download and check if file exists locally
             if args.upload_only:
-                if os.path.exists(local_path) and os.path.getsize(local_path) > 1024 * 1024:  # File exists and > 1MB
+                if _local_file_size(local_path) > 1024 * 1024:  # File exists and > 1MB
                     print(f"File {relative_path} ({idx}/{total_videos}) found locally - skipping download, proceeding to upload")
                     skip_download = True
                 else:
@@ -3665,139 +4313,88 @@ if __name__ == '__main__':
                 if skip_download:
                     print(f"File {relative_path} ({idx}/{total_videos}) is partially downloaded - skipping download, proceeding to upload")
             
-            # Download video
-            if not skip_download:
-                print(f"\nDownloading {relative_path} ({idx}/{total_videos})...")
-                if download_video(download_url, local_path, args.verbose, page):
-                    mark_file_partially_downloaded(relative_path, tree_file_path, args.verbose)
-                else:
-                    print(f"ERROR: Failed to download {relative_path}")
-                    print("Stopping execution due to download failure (per sequential processing algorithm)")
-                    # Cleanup browser before exit
-                    if 'context' in locals() and context:
-                        try:
-                            context.close()
-                        except:
-                            pass
-                    if 'browser' in locals() and browser:
-                        try:
-                            browser.close()
-                        except:
-                            pass
-                    if 'playwright_instance' in locals() and playwright_instance:
-                        try:
-                            playwright_instance.stop()
-                        except:
-                            pass
-                    sys.exit(EXIT_ERROR)
-            else:
-                if not os.path.exists(local_path):
-                    print(f"Warning: Partially downloaded file not found at {local_path}, re-downloading...")
-                    if not download_video(download_url, local_path, args.verbose, page):
-                        print(f"ERROR: Failed to re-download {relative_path}")
-                        print("Stopping execution due to download failure (per sequential processing algorithm)")
-                        # Cleanup browser before exit
-                        if 'context' in locals() and context:
-                            try:
-                                context.close()
-                            except:
-                                pass
-                        if 'browser' in locals() and browser:
-                            try:
-                                browser.close()
-                            except:
-                                pass
-                        if 'playwright_instance' in locals() and playwright_instance:
-                            try:
-                                playwright_instance.stop()
-                            except:
-                                pass
-                        sys.exit(EXIT_ERROR)
-            
-            # Upload to Yandex Disk
-            if destination_path and oauth_token:
-                # Remove leading slash from relative_path if present to avoid double slashes
-                clean_relative_path = relative_path.lstrip('/')
-                # Build full destination path properly
-                if destination_path.endswith('/'):
-                    full_destination = f"{destination_path}{clean_relative_path}"
-                else:
-                    full_destination = f"{destination_path}/{clean_relative_path}"
-                print(f"Uploading {relative_path} to {full_destination}...")
-                try:
-                    # Create folder structure on Yandex Disk
-                    if len(path_parts) > 1:
-                        folder_path = '/'.join(path_parts[:-1])
-                        # Remove leading slash from folder_path if present
-                        folder_path = folder_path.lstrip('/')
-                        create_folder_structure(destination_path, folder_path, oauth_token, args.verbose)
-                    
-                    upload_to_yandex_disk(local_path, full_destination, oauth_token, args.verbose)
-                    mark_file_downloaded(relative_path, tree_file_path, args.verbose)
-                    successful += 1
-                    
-                    # Delete local file after successful upload
-                    try:
-                        os.remove(local_path)
-                        if args.verbose:
-                            print(f"  Deleted local file: {local_path}")
-                    except Exception as e:
-                        if args.verbose:
-                            print(f"  Warning: Could not delete local file: {e}")
-                except Exception as e:
-                    print(f"ERROR: Failed to upload {relative_path}: {e}")
-                    print("Stopping execution due to upload failure (per sequential processing algorithm)")
-                    # Cleanup browser before exit
-                    if 'context' in locals() and context:
-                        try:
-                            context.close()
-                        except:
-                            pass
-                    if 'browser' in locals() and browser:
-                        try:
-                            browser.close()
-                        except:
-                            pass
-                    if 'playwright_instance' in locals() and playwright_instance:
+            jobs.append({
+                'relative_path': relative_path,
+                'download_url': download_url,
+                'local_path': local_path,
+                'path_parts': path_parts,
+                'skip_download': skip_download,
+                'idx': idx,
+                'total': total_videos,
+            })
+        
+        # Playwright is bound to this thread, so read the cookies once here for the workers
+        cookies = None
+        if page:
+            try:
+                cookies = _get_cookie_dict(page)
+            except Exception as e:
+                if args.verbose:
+                    print(f"Warning: Could not read browser cookies: {e}")
+        
+        # Files staged locally by an interrupted run may already be uploaded:
+        # check them in one concurrent batch and drop the ones Yandex Disk has
+        staged = [job for job in jobs if job['skip_download']] if destination_path and oauth_token else []
+        if staged:
+            remote_paths = {job['relative_path']: f"{destination_path.rstrip('/')}/{job['relative_path'].lstrip('/')}"
+                            for job in staged}
+            remote_files = disk_files_exist_batch(remote_paths.values(), oauth_token)
+            uploaded = set()
+            with TreeMarker(tree_file_path, args.verbose) as marker:
+                for job in staged:
+                    info = remote_files.get(remote_paths[job['relative_path']])
+                    # A missing local file simply doesn't match; the job re-downloads it
+                    job['remote_checked'] = True
+                    if _same_file_on_disk(job['local_path'], info):
+                        print(f"Skipping {job['relative_path']} ({job['idx']}/{total_videos}) - already on Yandex Disk")
+                        marker.mark(job['relative_path'], 'done')
                         try:
-                            playwright_instance.stop()
-                        except:
+                            os.remove(job['local_path'])
+                        except OSError:
                             pass
-                    sys.exit(EXIT_ERROR)
-            else:
-                print(f"Skipping upload (no destination path or OAuth token)")
-                successful += 1
+                        uploaded.add(job['relative_path'])
+                        successful += 1
+            jobs = [job for job in jobs if job['relative_path'] not in uploaded]
+        
+        # Create every remote folder up front, level by level, instead of per file
+        if jobs and destination_path and oauth_token:
+            create_folder_structure_batch(
+                destination_path,
+                {'/'.join(job['path_parts'][:-1]).lstrip('/') for job in jobs if len(job['path_parts']) > 1},
+                oauth_token, args.verbose)
+        
+        transfer_failed = False
+        if jobs:
+            with ThreadPoolExecutor(max_workers=min(_TRANSFER_WORKERS, len(jobs))) as executor:
+                futures = [executor.submit(_transfer_video, job, tree_file_path, destination_path,
+                                           oauth_token, cookies, args.verbose)
+                           for job in jobs]
+                for future in as_completed(futures):
+                    if future.result():
+                        successful += 1
+                    else:
+                        # Stop on first failure: drop queued jobs, let running ones finish
+                        transfer_failed = True
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        break
+        
+        if transfer_failed:
+            print("Stopping execution due to download/upload failure (per sequential processing algorithm)")
+            sys.exit(EXIT_ERROR)
         
         print(f"\nCompleted: {successful} successful, {failed} failed")
         
-        if 'successful' in locals() and 'failed' in locals():
-            sys.exit(EXIT_SUCCESS if successful > 0 or failed == 0 else EXIT_ERROR)
-        else:
-            sys.exit(EXIT_SUCCESS)
+        sys.exit(EXIT_SUCCESS if successful > 0 or failed == 0 else EXIT_ERROR)
         
     except KeyboardInterrupt:
         print("\nInterrupted by user")
         sys.exit(EXIT_ERROR)
     except Exception as e:
         print(f"Error: {e}")
-        if 'args' in locals() and args.verbose:
+        if args is not None and args.verbose:
             import traceback
             traceback.print_exc()
         sys.exit(EXIT_ERROR)
     finally:
-        # Cleanup browser
-        if 'context' in locals() and context:
-            try:
-                context.close()
-            except:
-                pass
-        if 'browser' in locals() and browser:
-            try:
-                browser.close()
-            except:
-                pass
-        if 'playwright_instance' in locals() and playwright_instance:
-            try:
-                playwright_instance.stop()
-            except:
-                pass
+        # Close contexts, then the shared browser and Playwright
+        cleanup.close()